@@ -9,8 +9,10 @@ from indico.core.signals.event import _signals
 
 
 before_reminder_make_email = _signals.signal('before-reminder-make-email', '''
-Executed before a reminder email is created. The `EventReminder` object is the sender.
+Executed before the reminder emails are created. The `EventReminder` object is the sender.
 The parameters to create an email (`to_list`, `sender_address`, `template` and `attachments`)
 are passed as kwargs; the signal can return a dict used to update the params which will then
-be passed to the `make_email` call.
+be passed to the `make_email` call. The signal is only sent once per reminder and not for
+each recipient, so `to_list` is always ``None`` and is replaced with the recipient's email address
+when creating the individual emails.
 ''')
@@ -0,0 +1,26 @@
+"""Drop redundant reminder junction table indexes
+
+Revision ID: 3c9e1f7a2b84
+Revises: 932389d22b1f
+Create Date: 2026-10-14 12:15:37.482113
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f7a2b84'
+down_revision = '932389d22b1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # reminder_id is the leading column of the primary key, so it is already indexed
+    op.drop_index('ix_reminders_forms_reminder_id', table_name='reminders_forms', schema='events')
+    op.drop_index('ix_reminders_tags_reminder_id', table_name='reminders_tags', schema='events')
+
+
+def downgrade():
+    op.create_index(None, 'reminders_tags', ['reminder_id'], schema='events')
+    op.create_index(None, 'reminders_forms', ['reminder_id'], schema='events')
@@ -0,0 +1,26 @@
+"""Add partial index for active registrations
+
+Revision ID: 8d41b6e0a7c3
+Revises: 3c9e1f7a2b84
+Create Date: 2026-10-14 12:48:05.617203
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6e0a7c3'
+down_revision = '3c9e1f7a2b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_registrations_event_id_active', 'registrations', ['event_id'],
+                    postgresql_where=sa.text('NOT is_deleted AND (state NOT IN (3, 4))'),
+                    schema='event_registration')
+
+
+def downgrade():
+    op.drop_index('ix_registrations_event_id_active', table_name='registrations', schema='event_registration')
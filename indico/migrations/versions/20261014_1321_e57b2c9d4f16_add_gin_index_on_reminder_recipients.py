@@ -0,0 +1,23 @@
+"""Add GIN index on reminder recipients
+
+Revision ID: e57b2c9d4f16
+Revises: 8d41b6e0a7c3
+Create Date: 2026-10-14 13:21:42.903518
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e57b2c9d4f16'
+down_revision = '8d41b6e0a7c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(None, 'reminders', ['recipients'], unique=False, schema='events', postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_reminders_recipients', table_name='reminders', schema='events')
@@ -5,10 +5,12 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+from functools import lru_cache
 from operator import attrgetter
 
 from flask import request, session
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, subqueryload
+from werkzeug.utils import cached_property
 from wtforms import ValidationError
 from wtforms_sqlalchemy.fields import QuerySelectField
 
@@ -23,7 +25,6 @@ from indico.modules.events.contributions.models.persons import AuthorType
 from indico.modules.events.fields import PersonLinkListFieldBase
 from indico.modules.events.roles.util import serialize_event_role
 from indico.modules.events.tracks.models.tracks import Track
-from indico.util.decorators import classproperty
 from indico.util.i18n import _
 from indico.web.flask.util import url_for
 from indico.web.forms.fields import JSONField
@@ -31,19 +32,36 @@ from indico.web.forms.fields.principals import SearchTokenMixin
 from indico.web.forms.widgets import DropdownWidget, JinjaWidget
 
 
+_INVITED_VALUE = AbstractState.invited.value
+_AUTHOR_NONE = AuthorType.none
+_AUTHOR_PRIMARY = AuthorType.primary
+_author_roles = {at.name: at for at in AuthorType if at != _AUTHOR_NONE}
+
+
+@lru_cache
+def _get_person_link_schema():
+    from indico.modules.events.persons.schemas import PersonLinkSchema
+    return PersonLinkSchema()
+
+
+def _get_abstract_label(abstract):
+    return f'#{abstract.friendly_id}: {abstract.title}'
+
+
+@lru_cache(maxsize=256)
+def _has_invitation_url_placeholder(body):
+    return AbstractInvitationURLPlaceholder.is_in(body, abstract=None)
+
+
 class EmailRuleListField(JSONField):
     """A field that stores a list of e-mail template rules."""
 
     CAN_POPULATE = True
     widget = JinjaWidget('events/abstracts/forms/rule_list_widget.html')
     accepted_condition_types = (StateCondition, TrackCondition, ContributionTypeCondition)
+    condition_class_map = {r.name: r for r in accepted_condition_types}
 
-    @classproperty
-    @classmethod
-    def condition_class_map(cls):
-        return {r.name: r for r in cls.accepted_condition_types}
-
-    @property
+    @cached_property
     def condition_choices(self):
         return {
             c.name: {
@@ -57,23 +75,23 @@ class EmailRuleListField(JSONField):
 
     def pre_validate(self, form):
         super().pre_validate(form)
-        if not all(self.data):
-            raise ValidationError(_('Rules may not be empty'))
-        if any('*' in crit for rule in self.data for crit in rule.values()):
-            # '*' (any) rules should never be included in the JSON, and having
-            # such an entry would result in the rule never passing.
-            raise ValidationError('Unexpected "*" criterion')
-        invited_rule_present = any(
-            AbstractState.invited.value in value
-            for rule in self.data
-            for value in rule.values()
-        )
+        invited_rule_present = False
+        for rule in self.data:
+            if not rule:
+                raise ValidationError(_('Rules may not be empty'))
+            for value in rule.values():
+                if '*' in value:
+                    # '*' (any) rules should never be included in the JSON, and having
+                    # such an entry would result in the rule never passing.
+                    raise ValidationError('Unexpected "*" criterion')
+                if _INVITED_VALUE in value:
+                    invited_rule_present = True
         # disallow mixing invited rules with other rules
         if invited_rule_present and len(self.data) > 1:
             raise ValidationError(_('You cannot combine the "Invited" rule with other rules'))
         # disallow changing the rule from/to "invited" since the email template would no longer be suitable
         if form.email_tpl:
-            has_invitation_link_placeholder = AbstractInvitationURLPlaceholder.is_in(form.email_tpl.body, abstract=None)
+            has_invitation_link_placeholder = _has_invitation_url_placeholder(form.email_tpl.body)
             if invited_rule_present != has_invitation_link_placeholder:
                 raise ValidationError(_('Existing notification templates cannot be changed from/to "Invited"; please '
                                         'create a new one'))
@@ -91,15 +109,17 @@ class AbstractPersonLinkListField(PersonLinkListFieldBase):
     create_untrusted_persons = True
     widget = JinjaWidget('forms/person_link_widget.html', allow_empty_email=True)
 
+    _base_roles = (
+        {'name': 'primary', 'label': _('Author'), 'plural': _('Authors'), 'section': True, 'default': True},
+        {'name': 'secondary', 'label': _('Co-author'), 'plural': _('Co-authors'), 'section': True},
+    )
+    _speaker_role = {'name': 'speaker', 'label': _('Speaker'), 'icon': 'microphone'}
+
     @property
     def roles(self):
-        roles = [
-            {'name': 'primary', 'label': _('Author'), 'plural': _('Authors'), 'section': True, 'default': True},
-            {'name': 'secondary', 'label': _('Co-author'), 'plural': _('Co-authors'), 'section': True},
-        ]
         if self.allow_speakers:
-            roles.append({'name': 'speaker', 'label': _('Speaker'), 'icon': 'microphone'})
-        return roles
+            return [*self._base_roles, self._speaker_role]
+        return list(self._base_roles)
 
     def __init__(self, *args, **kwargs):
         self.allow_speakers = kwargs.pop('allow_speakers', True)
@@ -114,12 +134,11 @@ class AbstractPersonLinkListField(PersonLinkListFieldBase):
         person_link = super()._get_person_link(data)
         roles = data.get('roles', [])
         person_link.is_speaker = 'speaker' in roles
-        person_link.author_type = next((AuthorType.get(a) for a in roles if AuthorType.get(a)), AuthorType.none)
+        person_link.author_type = next((_author_roles[a] for a in roles if a in _author_roles), AuthorType.none)
         return person_link
 
     def _serialize_person_link(self, principal):
-        from indico.modules.events.persons.schemas import PersonLinkSchema
-        data = PersonLinkSchema().dump(principal)
+        data = _get_person_link_schema().dump(principal)
         data['roles'] = []
         if principal.is_speaker:
             data['roles'].append('speaker')
@@ -128,13 +147,17 @@ class AbstractPersonLinkListField(PersonLinkListFieldBase):
 
     def pre_validate(self, form):
         super().pre_validate(form)
+        has_primary_author = has_speaker = False
         for person_link in self.data:
-            if person_link.author_type == AuthorType.none and not person_link.is_speaker:
+            if person_link.is_speaker:
+                has_speaker = True
+            elif person_link.author_type is _AUTHOR_NONE:
                 raise ValidationError(_('{} has no role').format(person_link.full_name))
-        if (self.require_primary_author and
-                not any(person_link.author_type == AuthorType.primary for person_link in self.data)):
+            if person_link.author_type is _AUTHOR_PRIMARY:
+                has_primary_author = True
+        if self.require_primary_author and not has_primary_author:
             raise ValidationError(_('You must add at least one author'))
-        if self.require_speaker and not any(person_link.is_speaker for person_link in self.data):
+        if self.require_speaker and not has_speaker:
             raise ValidationError(_('You must add at least one speaker'))
 
 
@@ -143,12 +166,13 @@ class AbstractField(QuerySelectField):
 
     widget = DropdownWidget(allow_by_id=True, search_field='title', label_field='full_title', preload=True,
                             search_method='POST', inline_js=True)
+    _invalid_formdata = None
 
     def __init__(self, *args, **kwargs):
         kwargs.setdefault('allow_blank', True)
         kwargs.setdefault('render_kw', {}).setdefault('placeholder', _('Enter abstract title or #id'))
-        kwargs['query_factory'] = self._get_query
-        kwargs['get_label'] = lambda a: f'#{a.friendly_id}: {a.title}'
+        kwargs['query_factory'] = self._get_list_query
+        kwargs['get_label'] = _get_abstract_label
         self.ajax_endpoint = kwargs.pop('ajax_endpoint')
         self.excluded_abstract_ids = set()
         super().__init__(*args, **kwargs)
@@ -156,19 +180,56 @@ class AbstractField(QuerySelectField):
     @classmethod
     def _serialize_abstract(cls, abstract):
         return {'id': abstract.id, 'friendly_id': abstract.friendly_id, 'title': abstract.title,
-                'full_title': f'#{abstract.friendly_id}: {abstract.title}'}
+                'full_title': _get_abstract_label(abstract)}
+
+    def _get_request_excluded_ids(self):
+        return {int(x) for x in request.form.getlist('excluded_abstract_id') if x.isdecimal()}
 
     def _get_query(self):
-        query = Abstract.query.with_parent(self.event).options(joinedload('submitter').lazyload('*'))
-        excluded = set(map(int, request.form.getlist('excluded_abstract_id')))
-        if excluded:
+        query = Abstract.query.with_parent(self.event)
+        if excluded := self._get_request_excluded_ids():
             query = query.filter(Abstract.id.notin_(excluded))
-        return query.order_by(Abstract.friendly_id)
+        return query
+
+    def _get_list_query(self):
+        query = self._get_query()
+        # the field's own excluded abstracts are not filtered in `_get_query` since
+        # `_get_data` uses it too and `pre_validate` needs to reject them explicitly
+        if self.excluded_abstract_ids:
+            query = query.filter(Abstract.id.notin_(self.excluded_abstract_ids))
+        # preload everything needed by `Abstract.can_access` to avoid
+        # lazy-loading relationships for each abstract in the list
+        return (query
+                .options(joinedload('submitter').lazyload('*'),
+                         subqueryload('reviewed_for_tracks'),
+                         subqueryload('person_links').joinedload('person').joinedload('user'))
+                .order_by(Abstract.friendly_id))
 
     def _get_object_list(self):
-        return [(key, abstract)
-                for key, abstract in super()._get_object_list()
-                if abstract.can_access(session.user)]
+        object_list = super()._get_object_list()
+        if self.event.can_manage(session.user, permission='abstracts'):
+            # managers can access all abstracts, no need to check each of them
+            return object_list
+        return [(key, abstract) for key, abstract in object_list if abstract.can_access(session.user)]
+
+    def _get_data(self):
+        # Unlike the parent class we do not load the full list of abstracts
+        # (which can be huge) just to find the one that has been submitted.
+        if self._formdata is not None and self._formdata != self._invalid_formdata:
+            abstract_id = int(self._formdata) if self._formdata.isdecimal() else None
+            # like the parent class, only accept the exact string representation of the id
+            if abstract_id is not None and str(abstract_id) == self._formdata:
+                abstract = self._get_query().filter(Abstract.id == abstract_id).first()
+            else:
+                abstract = None
+            if abstract is not None:
+                self._set_data(abstract)
+            else:
+                # remember the failed lookup so we do not query again whenever the data is accessed
+                self._invalid_formdata = self._formdata
+        return self._data
+
+    data = property(_get_data, QuerySelectField._set_data)
 
     def _value(self, for_react=False):
         if not self.data:
@@ -176,8 +237,14 @@ class AbstractField(QuerySelectField):
         return [self._serialize_abstract(self.data)] if for_react else self.data.id
 
     def pre_validate(self, form):
-        super().pre_validate(form)
-        if self.data is not None and self.data.id in self.excluded_abstract_ids:
+        if self.data is None:
+            if self._formdata or not self.allow_blank:
+                raise ValidationError(self.gettext('Not a valid choice'))
+            return
+        if (self.data.event_id != self.event.id or self.data.id in self._get_request_excluded_ids() or
+                not self.data.can_access(session.user)):
+            raise ValidationError(self.gettext('Not a valid choice'))
+        if self.data.id in self.excluded_abstract_ids:
             raise ValidationError(_('This abstract cannot be selected.'))
 
     @property
@@ -202,16 +269,16 @@ class TrackRoleField(SearchTokenMixin, JSONField):
     CAN_POPULATE = True
     widget = JinjaWidget('events/abstracts/forms/track_role_widget.html')
 
-    @property
+    @cached_property
     def permissions_info(self):
         permissions, tree, default = get_permissions_info(Track)
         return {'permissions': permissions, 'tree': tree['_full_access']['children'], 'default': default}
 
-    @property
+    @cached_property
     def event_roles(self):
         return [serialize_event_role(role, legacy=False) for role in sorted(self.event.roles, key=attrgetter('code'))]
 
-    @property
+    @cached_property
     def category_roles(self):
         from indico.modules.categories.models.roles import CategoryRole
         category_roles = CategoryRole.get_category_roles(self.event.category)
@@ -0,0 +1,84 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2025 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from contextlib import contextmanager
+
+import pytest
+from flask import session
+from wtforms import ValidationError
+
+from indico.modules.events.abstracts.fields import AbstractField
+from indico.web.forms.base import IndicoForm
+
+
+class MockForm(IndicoForm):
+    abstract = AbstractField('Abstract', ajax_endpoint='abstracts.other_abstracts')
+
+    def __init__(self, *args, **kwargs):
+        self.event = kwargs.pop('event')
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture
+def abstract_form_context(app, dummy_user):
+    """Return a context manager for a POST request submitting an abstract."""
+    @contextmanager
+    def _context(**data):
+        with app.test_request_context(method='POST', data=data):
+            session.set_session_user(dummy_user)
+            yield
+
+    return _context
+
+
+@pytest.fixture
+def abstract(dummy_event, dummy_user, create_abstract):
+    return create_abstract(dummy_event, 'Dummy abstract', id=123, submitter=dummy_user)
+
+
+def test_abstract_field_data(dummy_event, abstract, abstract_form_context):
+    with abstract_form_context(abstract=str(abstract.id)):
+        form = MockForm(event=dummy_event)
+        assert form.abstract.data == abstract
+        form.abstract.pre_validate(form)
+
+
+@pytest.mark.parametrize(('value', 'expected_queries'), (
+    (' 123 ', 0),
+    ('0123', 0),
+    ('123.0', 0),
+    ('+123', 0),
+    ('\u0661\u0662\u0663', 0),  # arabic-indic digits, which int() accepts
+    ('foo', 0),
+    ('1234', 1),
+))
+def test_abstract_field_data_invalid(dummy_event, abstract, abstract_form_context, count_queries, value,
+                                     expected_queries):
+    with abstract_form_context(abstract=value):
+        form = MockForm(event=dummy_event)
+        with count_queries() as count:
+            assert form.abstract.data is None
+            # a failed lookup is not repeated when accessing the data again
+            assert form.abstract.data is None
+        assert count() == expected_queries
+        with pytest.raises(ValidationError, match='Not a valid choice'):
+            form.abstract.pre_validate(form)
+
+
+def test_abstract_field_excluded(dummy_event, abstract, abstract_form_context):
+    # abstracts excluded in the request are rejected even when they come from the object data
+    with abstract_form_context(excluded_abstract_id='123'):
+        form = MockForm(event=dummy_event, abstract=abstract)
+        assert form.abstract.data == abstract
+        with pytest.raises(ValidationError, match='Not a valid choice'):
+            form.abstract.pre_validate(form)
+    with abstract_form_context(excluded_abstract_id='456'):
+        form = MockForm(event=dummy_event, abstract=abstract)
+        form.abstract.pre_validate(form)
+        form.abstract.excluded_abstract_ids = {123}
+        with pytest.raises(ValidationError, match='This abstract cannot be selected'):
+            form.abstract.pre_validate(form)
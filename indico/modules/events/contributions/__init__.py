@@ -14,9 +14,11 @@ from indico.core.db.sqlalchemy.protection import make_acl_log_fn
 from indico.core.logger import Logger
 from indico.core.permissions import ManagementPermission, check_permissions
 from indico.core.settings.converters import TimedeltaConverter
-from indico.modules.events.contributions.contrib_fields import get_contrib_field_types
+from indico.modules.events.contributions.contrib_fields import (ContribSingleChoiceField, ContribTextField,
+                                                               get_contrib_field_types)
 from indico.modules.events.contributions.models.contributions import Contribution
 from indico.modules.events.contributions.models.fields import ContributionField
+from indico.modules.events.contributions.models.principals import ContributionPrincipal
 from indico.modules.events.models.events import Event, EventType
 from indico.modules.events.settings import EventSettingsProxy
 from indico.util.i18n import _, ngettext
@@ -41,14 +43,12 @@ def _extend_event_management_menu(sender, event, **kwargs):
 
 @signals.users.merged.connect
 def _merge_users(target, source, **kwargs):
-    from indico.modules.events.contributions.models.principals import ContributionPrincipal
     ContributionPrincipal.merge_users(target, source, 'contribution')
 
 
 @signals.users.registered.connect
 @signals.users.email_added.connect
 def _convert_email_principals(user, silent=False, **kwargs):
-    from indico.modules.events.contributions.models.principals import ContributionPrincipal
     contributions = ContributionPrincipal.replace_email_with_user(user, 'contribution')
     if contributions and not silent:
         num = len(contributions)
@@ -59,9 +59,8 @@ def _convert_email_principals(user, silent=False, **kwargs):
 
 @signals.core.get_fields.connect_via(ContributionField)
 def _get_fields(sender, **kwargs):
-    from . import contrib_fields
-    yield contrib_fields.ContribTextField
-    yield contrib_fields.ContribSingleChoiceField
+    yield ContribTextField
+    yield ContribSingleChoiceField
 
 
 @signals.core.app_created.connect
@@ -115,7 +114,7 @@ def _get_event_management_url(event, **kwargs):
 
 @signals.event.sidemenu.connect
 def _extend_event_menu(sender, **kwargs):
-    from indico.modules.events.contributions.util import user_has_contributions
+    from indico.modules.events.contributions.util import event_has_contributions, user_has_contributions
     from indico.modules.events.layout.util import MenuEntryData
 
     def _visible_my_contributions(event):
@@ -124,9 +123,11 @@ def _extend_event_menu(sender, **kwargs):
         return user_has_contributions(event, session.user)
 
     def _visible_list_of_contributions(event):
-        published = contribution_settings.get(event, 'published')
-        can_manage = event.can_manage(session.user, permission='contributions')
-        return (published or can_manage) and Contribution.query.filter(Contribution.event == event).has_rows()
+        # the management check is the most expensive one, so we only perform
+        # it when the contribution list is not published anyway
+        if contribution_settings.get(event, 'published'):
+            return event_has_contributions(event)
+        return event.can_manage(session.user, permission='contributions') and event_has_contributions(event)
 
     yield MenuEntryData(title=_('My Contributions'), name='my_contributions', visible=_visible_my_contributions,
                         endpoint='contributions.my_contributions', position=2, parent='my_conference')
@@ -53,7 +53,7 @@ class ContributionPersonLinkListField(PersonLinkListFieldBase):
         person_link = super()._get_person_link(data)
         roles = data.get('roles', [])
         person_link.is_speaker = 'speaker' in roles
-        person_link.author_type = next((AuthorType.get(a) for a in roles if AuthorType.get(a)), AuthorType.none)
+        person_link.author_type = next((at for a in roles if (at := AuthorType.get(a))), AuthorType.none)
         return person_link
 
     def _serialize_person_link(self, principal):
@@ -30,6 +30,7 @@ from indico.modules.events.models.persons import EventPerson
 from indico.modules.events.persons.util import get_event_person
 from indico.modules.events.timetable.models.entries import TimetableEntry
 from indico.modules.events.util import track_time_changes
+from indico.util.caching import memoize_request
 from indico.util.date_time import format_human_timedelta
 from indico.util.i18n import _
 from indico.util.spreadsheets import csv_text_io_wrapper
@@ -245,6 +246,12 @@ def get_contributions_for_person(event, person, only_speakers=False):
             .all())
 
 
+@memoize_request
+def event_has_contributions(event):
+    """Return True if the event contains any contributions."""
+    return Contribution.query.filter(Contribution.event == event).has_rows()
+
+
 def _query_contributions_for_user(event, user):
     """Query for all contributions in an event associated with the given user.
 
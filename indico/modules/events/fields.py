@@ -27,7 +27,7 @@ from indico.modules.events.persons.util import get_event_person
 from indico.modules.users import user_management_settings
 from indico.modules.users.models.affiliations import Affiliation
 from indico.modules.users.models.users import UserTitle
-from indico.modules.users.util import get_user_by_email
+from indico.modules.users.util import get_user_by_email, has_predefined_affiliations
 from indico.util.i18n import _
 from indico.util.signals import values_from_signal
 from indico.util.user import make_user_search_token
@@ -109,7 +109,7 @@ class PersonLinkListFieldBase(PrincipalListField):
 
     @property
     def has_predefined_affiliations(self):
-        return Affiliation.query.filter(~Affiliation.is_deleted).has_rows()
+        return has_predefined_affiliations()
 
     @property
     def allow_custom_affiliations(self):
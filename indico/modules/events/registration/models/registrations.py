@@ -107,6 +107,9 @@ class Registration(db.Model):
                                postgresql_where=db.text('NOT is_deleted AND (state NOT IN (3, 4))')),
                       db.Index(None, 'registration_form_id', 'email', unique=True,
                                postgresql_where=db.text('NOT is_deleted AND (state NOT IN (3, 4))')),
+                      # used when looking up the active registrations of an event, e.g. for reminders
+                      db.Index('ix_registrations_event_id_active', 'event_id',
+                               postgresql_where=db.text('NOT is_deleted AND (state NOT IN (3, 4))')),
                       db.ForeignKeyConstraint(['event_id', 'registration_form_id'],
                                               ['event_registration.forms.event_id', 'event_registration.forms.id']),
                       {'schema': 'event_registration'})
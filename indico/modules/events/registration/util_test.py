@@ -9,6 +9,7 @@ import itertools
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 from flask import session
@@ -33,14 +34,21 @@ from indico.testing.util import assert_json_snapshot
 pytest_plugins = 'indico.modules.events.registration.testing.fixtures'
 
 
-@pytest.mark.usefixtures('dummy_regform')
-def test_import_users():
-    csv = b'\n'.join([b'John,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,jdoe@example.test',
-                      b'Jane,Smith,ACME Inc.,CEO,,jane@example.test',
-                      b'Billy Bob,Doe,,,,1337@EXAMPLE.test'])
+@pytest.fixture(autouse=True)
+def no_invitation_emails(monkeypatch):
+    """Prevent invitation emails from being sent."""
+    monkeypatch.setattr('indico.modules.events.registration.util.notify_invitation', lambda *args, **kwargs: None)
+
+
+USERS_CSV = (b'John,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,jdoe@example.test\n'
+             b'Jane,Smith,ACME Inc.,CEO,,jane@example.test\n'
+             b'Billy Bob,Doe,,,,1337@EXAMPLE.test')
 
+
+@pytest.mark.usefixtures('db')
+def test_import_users():
     columns = ['first_name', 'last_name', 'affiliation', 'position', 'phone', 'email']
-    users = import_user_records_from_csv(BytesIO(csv), columns)
+    users = import_user_records_from_csv(BytesIO(USERS_CSV), columns)
     assert len(users) == 3
 
     assert users[0] == {
@@ -71,70 +79,45 @@ def test_import_users():
     }
 
 
-def test_import_users_error(create_user):
-    columns = ['first_name', 'last_name', 'affiliation', 'position', 'phone', 'email']
-    user = create_user(123, email='test1@example.test')
-    user.secondary_emails.add('test2@example.test')
-
+@pytest.mark.parametrize(('csv', 'expected'), (
     # missing column
-    csv = b'\n'.join([b'John,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,jdoe@example.test',
-                      b'Buggy,Entry,ACME Inc.,CEO,'])
-
-    with pytest.raises(UserValueError) as e:
-        import_user_records_from_csv(BytesIO(csv), columns)
-    assert 'malformed' in str(e.value)
-    assert 'Row 2' in str(e.value)
-
+    ((b'John,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,jdoe@example.test\n'
+      b'Buggy,Entry,ACME Inc.,CEO,'),
+     'malformed'),
     # missing e-mail
-    csv = b'\n'.join([b'Bill,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,bdoe@example.test',
-                      b'Buggy,Entry,ACME Inc.,CEO,,'])
-
-    with pytest.raises(UserValueError) as e:
-        import_user_records_from_csv(BytesIO(csv), columns)
-    assert 'missing e-mail' in str(e.value)
-    assert 'Row 2' in str(e.value)
-
+    ((b'Bill,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,bdoe@example.test\n'
+      b'Buggy,Entry,ACME Inc.,CEO,,'),
+     'missing e-mail'),
     # bad e-mail
-    csv = b'\n'.join([b'Bill,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,bdoe@example.test',
-                      b'Buggy,Entry,ACME Inc.,CEO,,not-an-email'])
-
-    with pytest.raises(UserValueError) as e:
-        import_user_records_from_csv(BytesIO(csv), columns)
-    assert 'invalid e-mail' in str(e.value)
-    assert 'Row 2' in str(e.value)
-
+    ((b'Bill,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,bdoe@example.test\n'
+      b'Buggy,Entry,ACME Inc.,CEO,,not-an-email'),
+     'invalid e-mail'),
     # duplicate e-mail
-    csv = b'\n'.join([b'Bill,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,bdoe@example.test',
-                      b'Bob,Doe,ACME Inc.,Boss,,bdoe@example.test'])
-
-    with pytest.raises(UserValueError) as e:
-        import_user_records_from_csv(BytesIO(csv), columns)
-    assert 'email address is not unique' in str(e.value)
-    assert 'Row 2' in str(e.value)
-
+    ((b'Bill,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,bdoe@example.test\n'
+      b'Bob,Doe,ACME Inc.,Boss,,bdoe@example.test'),
+     'email address is not unique'),
     # duplicate user
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,Supreme Leader,+1-202-555-1337,test1@example.test',
-                      b'Little,Boss,ACME Inc.,Wannabe Leader,+1-202-555-1338,test2@EXAMPLE.test'])
-
-    with pytest.raises(UserValueError) as e:
-        import_user_records_from_csv(BytesIO(csv), columns)
-    assert 'Row 2: email address belongs to the same user as in row 1' in str(e.value)
-
+    ((b'Big,Boss,ACME Inc.,Supreme Leader,+1-202-555-1337,test1@example.test\n'
+      b'Little,Boss,ACME Inc.,Wannabe Leader,+1-202-555-1338,test2@EXAMPLE.test'),
+     'Row 2: email address belongs to the same user as in row 1'),
     # missing first name
-    csv = b'\n'.join([b'Ray,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,rdoe@example.test',
-                      b',Buggy,ACME Inc.,CEO,,buggy@example.test'])
+    ((b'Ray,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,rdoe@example.test\n'
+      b',Buggy,ACME Inc.,CEO,,buggy@example.test'),
+     'missing first'),
+))
+def test_import_users_error(create_user, csv, expected):
+    columns = ['first_name', 'last_name', 'affiliation', 'position', 'phone', 'email']
+    user = create_user(123, email='test1@example.test')
+    user.secondary_emails.add('test2@example.test')
 
     with pytest.raises(UserValueError) as e:
         import_user_records_from_csv(BytesIO(csv), columns)
-    assert 'missing first' in str(e.value)
+    assert expected in str(e.value)
     assert 'Row 2' in str(e.value)
 
 
 def test_import_registrations(dummy_regform, dummy_user):
-    csv = b'\n'.join([b'John,Doe,ACME Inc.,Regional Manager,+1-202-555-0140,jdoe@example.test',
-                      b'Jane,Smith,ACME Inc.,CEO,,jane@example.test',
-                      b'Billy Bob,Doe,,,,1337@EXAMPLE.test'])
-    registrations = import_registrations_from_csv(dummy_regform, BytesIO(csv))
+    registrations = import_registrations_from_csv(dummy_regform, BytesIO(USERS_CSV))
     assert len(registrations) == 3
 
     assert registrations[0].full_name == 'John Doe'
@@ -178,7 +161,7 @@ def test_import_registrations_error(dummy_regform, dummy_user):
     }, notify_user=False)
 
     # duplicate e-mail
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,Supreme Leader,+1-202-555-1337,boss@example.test'])
+    csv = b'Big,Boss,ACME Inc.,Supreme Leader,+1-202-555-1337,boss@example.test'
 
     with pytest.raises(UserValueError) as e:
         import_registrations_from_csv(dummy_regform, BytesIO(csv))
@@ -186,7 +169,7 @@ def test_import_registrations_error(dummy_regform, dummy_user):
     assert 'Row 1' in str(e.value)
 
     # duplicate user
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,Supreme Leader,+1-202-555-1337,dummy@example.test'])
+    csv = b'Big,Boss,ACME Inc.,Supreme Leader,+1-202-555-1337,dummy@example.test'
 
     with pytest.raises(UserValueError) as e:
         import_registrations_from_csv(dummy_regform, BytesIO(csv))
@@ -194,12 +177,10 @@ def test_import_registrations_error(dummy_regform, dummy_user):
     assert 'Row 1' in str(e.value)
 
 
-def test_import_invitations(monkeypatch, dummy_regform, dummy_user):
-    monkeypatch.setattr('indico.modules.events.registration.util.notify_invitation', lambda *args, **kwargs: None)
-
+def test_import_invitations(dummy_regform, dummy_user):
     # normal import with no conflicts
-    csv = b'\n'.join([b'Bob,Doe,ACME Inc.,bdoe@example.test',
-                      b'Jane,Smith,ACME Inc.,jsmith@example.test'])
+    csv = (b'Bob,Doe,ACME Inc.,bdoe@example.test\n'
+           b'Jane,Smith,ACME Inc.,jsmith@example.test')
     invitations, skipped = import_invitations_from_csv(dummy_regform, BytesIO(csv),
                                                        email_sender='noreply@example.test', email_subject='invitation',
                                                        email_body='Invitation to event',
@@ -223,71 +204,32 @@ def test_import_invitations(monkeypatch, dummy_regform, dummy_user):
     assert not invitations[1].skip_access_check
 
 
-def test_import_invitations_duplicate_invitation(monkeypatch, dummy_regform, dummy_user):
-    monkeypatch.setattr('indico.modules.events.registration.util.notify_invitation', lambda *args, **kwargs: None)
-
-    invitation = RegistrationInvitation(skip_moderation=True, email='awang@example.test', first_name='Amy',
-                                        last_name='Wang', affiliation='ACME Inc.')
-    dummy_regform.invitations.append(invitation)
-
-    # duplicate invitation with 'skip_existing=True'
-    csv = b'\n'.join([b'Amy,Wang,ACME Inc.,awang@example.test',
-                      b'Jane,Smith,ACME Inc.,jsmith@example.test'])
-    invitations, skipped = import_invitations_from_csv(dummy_regform, BytesIO(csv),
-                                                       email_sender='noreply@example.test', email_subject='invitation',
-                                                       email_body='Invitation to event',
-                                                       skip_moderation=True, skip_existing=True)
-    assert len(invitations) == 1
-    assert skipped == 1
-
-    assert invitations[0].first_name == 'Jane'
-    assert invitations[0].last_name == 'Smith'
-    assert invitations[0].affiliation == 'ACME Inc.'
-    assert invitations[0].email == 'jsmith@example.test'
-    assert invitations[0].skip_moderation
-    assert invitations[0].skip_access_check
-
-
-def test_import_invitations_duplicate_registration(monkeypatch, dummy_regform):
-    monkeypatch.setattr('indico.modules.events.registration.util.notify_invitation', lambda *args, **kwargs: None)
-
-    create_registration(dummy_regform, {
-        'email': 'boss@example.test',
-        'first_name': 'Big',
-        'last_name': 'Boss'
-    }, notify_user=False)
-
-    # duplicate registration with 'skip_existing=True'
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,boss@example.test',
-                      b'Jane,Smith,ACME Inc.,jsmith@example.test'])
-    invitations, skipped = import_invitations_from_csv(dummy_regform, BytesIO(csv),
-                                                       email_sender='noreply@example.test', email_subject='invitation',
-                                                       email_body='Invitation to event',
-                                                       skip_moderation=True, skip_existing=True)
-    assert len(invitations) == 1
-    assert skipped == 1
-
-    assert invitations[0].first_name == 'Jane'
-    assert invitations[0].last_name == 'Smith'
-    assert invitations[0].affiliation == 'ACME Inc.'
-    assert invitations[0].email == 'jsmith@example.test'
-    assert invitations[0].skip_moderation
-    assert invitations[0].skip_access_check
-
-
-def test_import_invitations_duplicate_user(monkeypatch, dummy_regform, dummy_user):
-    monkeypatch.setattr('indico.modules.events.registration.util.notify_invitation', lambda *args, **kwargs: None)
-
-    dummy_user.secondary_emails.add('dummy@example.test')
-    create_registration(dummy_regform, {
-        'email': dummy_user.email,
-        'first_name': dummy_user.first_name,
-        'last_name': dummy_user.last_name
-    }, notify_user=False)
-
-    # duplicate user with 'skip_existing=True'
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,dummy@example.test',
-                      b'Jane,Smith,ACME Inc.,jsmith@example.test'])
+@pytest.mark.parametrize(('conflict', 'csv_row'), (
+    ('invitation', b'Amy,Wang,ACME Inc.,awang@example.test'),
+    ('registration', b'Big,Boss,ACME Inc.,boss@example.test'),
+    ('user', b'Big,Boss,ACME Inc.,dummy@example.test'),
+))
+def test_import_invitations_duplicate(dummy_regform, dummy_user, conflict, csv_row):
+    if conflict == 'invitation':
+        invitation = RegistrationInvitation(skip_moderation=True, email='awang@example.test', first_name='Amy',
+                                            last_name='Wang', affiliation='ACME Inc.')
+        dummy_regform.invitations.append(invitation)
+    elif conflict == 'registration':
+        create_registration(dummy_regform, {
+            'email': 'boss@example.test',
+            'first_name': 'Big',
+            'last_name': 'Boss'
+        }, notify_user=False)
+    elif conflict == 'user':
+        dummy_user.secondary_emails.add('dummy@example.test')
+        create_registration(dummy_regform, {
+            'email': dummy_user.email,
+            'first_name': dummy_user.first_name,
+            'last_name': dummy_user.last_name
+        }, notify_user=False)
+
+    # duplicate entry with 'skip_existing=True'
+    csv = csv_row + b'\nJane,Smith,ACME Inc.,jsmith@example.test'
     invitations, skipped = import_invitations_from_csv(dummy_regform, BytesIO(csv),
                                                        email_sender='noreply@example.test', email_subject='invitation',
                                                        email_body='Invitation to event',
@@ -323,7 +265,7 @@ def test_import_invitations_error(dummy_regform, dummy_user):
     dummy_regform.invitations.append(invitation)
 
     # duplicate e-mail (registration)
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,boss@example.test'])
+    csv = b'Big,Boss,ACME Inc.,boss@example.test'
 
     with pytest.raises(UserValueError) as e:
         import_invitations_from_csv(dummy_regform, BytesIO(csv),
@@ -334,7 +276,7 @@ def test_import_invitations_error(dummy_regform, dummy_user):
     assert 'Row 1' in str(e.value)
 
     # duplicate user
-    csv = b'\n'.join([b'Big,Boss,ACME Inc.,dummy@example.test'])
+    csv = b'Big,Boss,ACME Inc.,dummy@example.test'
 
     with pytest.raises(UserValueError) as e:
         import_invitations_from_csv(dummy_regform, BytesIO(csv),
@@ -345,7 +287,7 @@ def test_import_invitations_error(dummy_regform, dummy_user):
     assert 'Row 1' in str(e.value)
 
     # duplicate email (invitation)
-    csv = b'\n'.join([b'Bill,Doe,ACME Inc.,bdoe@example.test'])
+    csv = b'Bill,Doe,ACME Inc.,bdoe@example.test'
     with pytest.raises(UserValueError) as e:
         import_invitations_from_csv(dummy_regform, BytesIO(csv),
                                     email_sender='noreply@example.test', email_subject='invitation',
@@ -355,52 +297,52 @@ def test_import_invitations_error(dummy_regform, dummy_user):
     assert 'Row 1' in str(e.value)
 
 
-@pytest.mark.parametrize(('start_dt', 'end_dt', 'include_scheduled', 'expected_regform_flag'), (
-    (datetime(2007, 1, 1, 1, 0, 0), datetime(2007, 2, 1, 1, 0, 0), False, False),
-    (datetime(2019, 1, 1, 1, 0, 0), datetime(2020, 2, 1, 1, 0, 0), False, True),
-    (datetime(2007, 1, 1, 1, 0, 0), datetime(2007, 2, 1, 1, 0, 0), True, True),
-    (datetime(2019, 1, 1, 1, 0, 0), datetime(2020, 2, 1, 1, 0, 0), True, True),
-    (None, datetime(2020, 2, 1, 1, 0, 0), False, False),
-    (None, datetime(2020, 2, 1, 1, 0, 0), True, False),
-    (datetime(2019, 1, 1, 1, 0, 0), None, False, True),
-    (None, None, False, False),
-    (None, None, True, False)
-))
-def test_get_event_regforms_no_registration(dummy_event, dummy_user, dummy_regform, freeze_time, start_dt, end_dt,
-                                            include_scheduled, expected_regform_flag):
-    freeze_time(datetime(2019, 12, 13, 8, 0, 0))
+@pytest.fixture
+def bounded_regform(request, dummy_event, dummy_regform):
+    """Set the start/end dates passed as the fixture parameter on the dummy registration form."""
+    start_dt, end_dt = request.param
     if start_dt:
         dummy_regform.start_dt = dummy_event.tzinfo.localize(start_dt)
     if end_dt:
         dummy_regform.end_dt = dummy_event.tzinfo.localize(end_dt)
-
+    return dummy_regform
+
+
+@pytest.mark.parametrize(('bounded_regform', 'include_scheduled', 'expected_regform_flag'), (
+    ((datetime(2007, 1, 1, 1, 0, 0), datetime(2007, 2, 1, 1, 0, 0)), False, False),
+    ((datetime(2019, 1, 1, 1, 0, 0), datetime(2020, 2, 1, 1, 0, 0)), False, True),
+    ((datetime(2007, 1, 1, 1, 0, 0), datetime(2007, 2, 1, 1, 0, 0)), True, True),
+    ((datetime(2019, 1, 1, 1, 0, 0), datetime(2020, 2, 1, 1, 0, 0)), True, True),
+    ((None, datetime(2020, 2, 1, 1, 0, 0)), False, False),
+    ((None, datetime(2020, 2, 1, 1, 0, 0)), True, False),
+    ((datetime(2019, 1, 1, 1, 0, 0), None), False, True),
+    ((None, None), False, False),
+    ((None, None), True, False)
+), indirect=['bounded_regform'])
+def test_get_event_regforms_no_registration(dummy_event, dummy_user, bounded_regform, freeze_time,
+                                            include_scheduled, expected_regform_flag):
+    freeze_time(datetime(2019, 12, 13, 8, 0, 0))
     regforms, registrations = get_event_regforms_registrations(dummy_event, dummy_user, include_scheduled)
 
-    assert (dummy_regform in regforms) == expected_regform_flag
+    assert (bounded_regform in regforms) == expected_regform_flag
     assert list(registrations.values()) == [None]
 
 
-@pytest.mark.parametrize(('start_dt', 'end_dt', 'include_scheduled'), (
-    (datetime(2019, 1, 1, 1, 0, 0), datetime(2019, 2, 1, 1, 0, 0), True),
-    (datetime(2018, 1, 1, 1, 0, 0), datetime(2018, 12, 1, 1, 0, 0), False),
-    (datetime(2019, 1, 1, 1, 0, 0), datetime(2020, 2, 1, 1, 0, 0), False),
-    (None, None, False),
-    (datetime(2008, 1, 1, 1, 0, 0), None, False),
-    (None, datetime(2020, 12, 1, 1, 0, 0), True),
-))
+@pytest.mark.parametrize(('bounded_regform', 'include_scheduled'), (
+    ((datetime(2019, 1, 1, 1, 0, 0), datetime(2019, 2, 1, 1, 0, 0)), True),
+    ((datetime(2018, 1, 1, 1, 0, 0), datetime(2018, 12, 1, 1, 0, 0)), False),
+    ((datetime(2019, 1, 1, 1, 0, 0), datetime(2020, 2, 1, 1, 0, 0)), False),
+    ((None, None), False),
+    ((datetime(2008, 1, 1, 1, 0, 0), None), False),
+    ((None, datetime(2020, 12, 1, 1, 0, 0)), True),
+), indirect=['bounded_regform'])
 @pytest.mark.usefixtures('dummy_reg')
-def test_get_event_regforms_registration(dummy_event, dummy_user, dummy_regform, start_dt, end_dt, include_scheduled,
-                                         freeze_time):
+def test_get_event_regforms_registration(dummy_event, dummy_user, bounded_regform, include_scheduled, freeze_time):
     freeze_time(datetime(2019, 12, 13, 8, 0, 0))
-    if start_dt:
-        dummy_regform.start_dt = dummy_event.tzinfo.localize(start_dt)
-    if end_dt:
-        dummy_regform.end_dt = dummy_event.tzinfo.localize(end_dt)
-
     regforms, registrations = get_event_regforms_registrations(dummy_event, dummy_user, include_scheduled=False)
 
     assert list(registrations.values())[0].user == dummy_user
-    assert dummy_regform in regforms
+    assert bounded_regform in regforms
 
 
 @pytest.mark.usefixtures('dummy_reg')
@@ -413,6 +355,7 @@ def test_get_registered_event_persons(dummy_event, dummy_user, dummy_regform):
 
     user_person = EventPerson.create_from_user(dummy_user, dummy_event)
     no_user_person = EventPerson(
+        event=dummy_event,
         email='john@example.test',
         first_name='John',
         last_name='Doe'
@@ -425,13 +368,12 @@ def test_get_registered_event_persons(dummy_event, dummy_user, dummy_regform):
     }, notify_user=False)
 
     no_user_no_reg = EventPerson(
+        event=dummy_event,
         email='noshow@example.test',
         first_name='No',
         last_name='Show'
     )
-    dummy_event.persons.append(user_person)
-    dummy_event.persons.append(no_user_person)
-    dummy_event.persons.append(no_user_no_reg)
+    db.session.add_all([user_person, no_user_person, no_user_no_reg])
     db.session.flush()
 
     registered_persons = get_registered_event_persons(dummy_event)
@@ -457,6 +399,15 @@ def test_create_registration(monkeypatch, dummy_user, dummy_regform):
             {'caption': 'B', 'id': 'new:test2', 'is_enabled': True},
         ]
     })
+
+    # Add a manager only section
+    manager_section = RegistrationFormSection(registration_form=dummy_regform, title='manager_section',
+                                              is_manager_only=True)
+
+    checkbox_field = RegistrationFormField(parent=manager_section, registration_form=dummy_regform)
+    _fill_form_field_with_data(checkbox_field, {
+        'input_type': 'checkbox', 'title': 'Checkbox'
+    })
     db.session.flush()
 
     data = {
@@ -464,45 +415,37 @@ def test_create_registration(monkeypatch, dummy_user, dummy_regform):
         multi_choice_field.html_field_name: {'test1': 2},
         'email': dummy_user.email, 'first_name': dummy_user.first_name, 'last_name': dummy_user.last_name
     }
+    savepoint = db.session.begin_nested()
     reg = create_registration(dummy_regform, data, invitation=None, management=False, notify_user=False)
 
     assert reg.data_by_field[boolean_field.id].data
     assert reg.data_by_field[multi_choice_field.id].data == {'test1': 2}
-    db.session.delete(reg)
-    db.session.flush()
+    savepoint.rollback()
 
     # Make sure that missing data gets default values:
     data = {
         'email': dummy_user.email, 'first_name': dummy_user.first_name, 'last_name': dummy_user.last_name
     }
+    savepoint = db.session.begin_nested()
     reg = create_registration(dummy_regform, data, invitation=None, management=False, notify_user=False)
 
     assert not reg.data_by_field[boolean_field.id].data
     assert reg.data_by_field[multi_choice_field.id].data == {}
-    db.session.delete(reg)
-    db.session.flush()
-
-    # Add a manager only section
-    section = RegistrationFormSection(registration_form=dummy_regform, title='manager_section', is_manager_only=True)
-
-    checkbox_field = RegistrationFormField(parent=section, registration_form=dummy_regform)
-    _fill_form_field_with_data(checkbox_field, {
-        'input_type': 'checkbox', 'title': 'Checkbox'
-    })
-    db.session.flush()
+    savepoint.rollback()
 
+    # Check that the manager-only field does not accept data from users
     data = {
         checkbox_field.html_field_name: True,
         'email': dummy_user.email, 'first_name': dummy_user.first_name, 'last_name': dummy_user.last_name
     }
+    savepoint = db.session.begin_nested()
     reg = create_registration(dummy_regform, data, invitation=None, management=False, notify_user=False)
 
     assert not reg.data_by_field[boolean_field.id].data
     assert reg.data_by_field[multi_choice_field.id].data == {}
     # Assert that the manager field gets the default value, not the value sent
     assert not reg.data_by_field[checkbox_field.id].data
-    db.session.delete(reg)
-    db.session.flush()
+    savepoint.rollback()
 
     # Try again with management=True
     data = {
@@ -517,11 +460,9 @@ def test_create_registration(monkeypatch, dummy_user, dummy_regform):
     assert reg.data_by_field[checkbox_field.id].data
 
 
-@pytest.mark.usefixtures('request_context')
-def test_modify_registration(monkeypatch, dummy_user, dummy_regform):
-    monkeypatch.setattr('indico.modules.users.util.get_user_by_email', lambda *args, **kwargs: dummy_user)
-
-    # Extend the dummy_regform with more sections and fields
+@pytest.fixture
+def regform_with_fields(dummy_regform):
+    """Extend the dummy registration form with a user and a manager-only section."""
     user_section = RegistrationFormSection(registration_form=dummy_regform,
                                            title='dummy_section', is_manager_only=False)
 
@@ -540,7 +481,6 @@ def test_modify_registration(monkeypatch, dummy_user, dummy_regform):
     })
     choice_uuid = next(k for k, v in multi_choice_field.data['captions'].items() if v == 'A')
 
-    # Add a manager-only section
     management_section = RegistrationFormSection(registration_form=dummy_regform,
                                                  title='manager_section', is_manager_only=True)
 
@@ -549,58 +489,84 @@ def test_modify_registration(monkeypatch, dummy_user, dummy_regform):
         'input_type': 'checkbox', 'is_required': True, 'title': 'Checkbox'
     })
     db.session.flush()
+    return SimpleNamespace(user_section=user_section, boolean_field=boolean_field,
+                           multi_choice_field=multi_choice_field, choice_uuid=choice_uuid,
+                           checkbox_field=checkbox_field)
 
-    # Create a registration
+
+@pytest.fixture
+def modifiable_registration(request_context, monkeypatch, dummy_user, dummy_regform, regform_with_fields):
+    """Create a registration with data for all the fields of `regform_with_fields`."""
+    monkeypatch.setattr('indico.modules.users.util.get_user_by_email', lambda *args, **kwargs: dummy_user)
+    fields = regform_with_fields
     data = {
-        boolean_field.html_field_name: True,
-        multi_choice_field.html_field_name: {choice_uuid: 2},
-        checkbox_field.html_field_name: True,
+        fields.boolean_field.html_field_name: True,
+        fields.multi_choice_field.html_field_name: {fields.choice_uuid: 2},
+        fields.checkbox_field.html_field_name: True,
         'email': dummy_user.email, 'first_name': dummy_user.first_name, 'last_name': dummy_user.last_name
     }
-    reg = create_registration(dummy_regform, data, invitation=None, management=True, notify_user=False)
+    return create_registration(dummy_regform, data, invitation=None, management=True, notify_user=False)
 
-    assert reg.data_by_field[boolean_field.id].data
-    assert reg.data_by_field[multi_choice_field.id].data == {choice_uuid: 2}
-    assert reg.data_by_field[checkbox_field.id].data
 
+def test_modify_registration_created(regform_with_fields, modifiable_registration):
+    fields = regform_with_fields
+    reg = modifiable_registration
+    assert reg.data_by_field[fields.boolean_field.id].data
+    assert reg.data_by_field[fields.multi_choice_field.id].data == {fields.choice_uuid: 2}
+    assert reg.data_by_field[fields.checkbox_field.id].data
+
+
+def test_modify_registration_partial(regform_with_fields, modifiable_registration):
+    fields = regform_with_fields
+    reg = modifiable_registration
     # Modify the registration without re-sending unchanged data
     data = {
-        multi_choice_field.html_field_name: {choice_uuid: 1},
-        checkbox_field.html_field_name: False,  # manager-only --> value must be ignored
+        fields.multi_choice_field.html_field_name: {fields.choice_uuid: 1},
+        fields.checkbox_field.html_field_name: False,  # manager-only --> value must be ignored
     }
     modify_registration(reg, data, management=False, notify_user=False)
 
-    assert reg.data_by_field[boolean_field.id].data
-    assert reg.data_by_field[multi_choice_field.id].data == {choice_uuid: 1}
+    assert reg.data_by_field[fields.boolean_field.id].data
+    assert reg.data_by_field[fields.multi_choice_field.id].data == {fields.choice_uuid: 1}
     # Assert that the manager field is not changed
-    assert reg.data_by_field[checkbox_field.id].data
+    assert reg.data_by_field[fields.checkbox_field.id].data
+
 
-    # Modify the registration
+def test_modify_registration_resend_unchanged(regform_with_fields, modifiable_registration):
+    fields = regform_with_fields
+    reg = modifiable_registration
     data = {
-        boolean_field.html_field_name: True,  # unmodified, but re-sending it is allowed
-        multi_choice_field.html_field_name: {choice_uuid: 1},
-        checkbox_field.html_field_name: False,  # manager-only --> value must be ignored
+        fields.boolean_field.html_field_name: True,  # unmodified, but re-sending it is allowed
+        fields.multi_choice_field.html_field_name: {fields.choice_uuid: 1},
+        fields.checkbox_field.html_field_name: False,  # manager-only --> value must be ignored
     }
     modify_registration(reg, data, management=False, notify_user=False)
 
-    assert reg.data_by_field[boolean_field.id].data
-    assert reg.data_by_field[multi_choice_field.id].data == {choice_uuid: 1}
+    assert reg.data_by_field[fields.boolean_field.id].data
+    assert reg.data_by_field[fields.multi_choice_field.id].data == {fields.choice_uuid: 1}
     # Assert that the manager field is not changed
-    assert reg.data_by_field[checkbox_field.id].data
+    assert reg.data_by_field[fields.checkbox_field.id].data
+
 
-    # Modify as a manager
+def test_modify_registration_as_manager(regform_with_fields, modifiable_registration):
+    fields = regform_with_fields
+    reg = modifiable_registration
     data = {
-        multi_choice_field.html_field_name: {choice_uuid: 3},
-        checkbox_field.html_field_name: False,
+        fields.multi_choice_field.html_field_name: {fields.choice_uuid: 3},
+        fields.checkbox_field.html_field_name: False,
     }
     modify_registration(reg, data, management=True, notify_user=False)
 
-    assert reg.data_by_field[boolean_field.id].data
-    assert reg.data_by_field[multi_choice_field.id].data == {choice_uuid: 3}
-    assert not reg.data_by_field[checkbox_field.id].data
+    assert reg.data_by_field[fields.boolean_field.id].data
+    assert reg.data_by_field[fields.multi_choice_field.id].data == {fields.choice_uuid: 3}
+    assert not reg.data_by_field[fields.checkbox_field.id].data
+
 
+def test_modify_registration_new_field(dummy_regform, regform_with_fields, modifiable_registration):
+    fields = regform_with_fields
+    reg = modifiable_registration
     # Add a new field after registering
-    new_multi_choice_field = RegistrationFormField(parent=user_section, registration_form=dummy_regform)
+    new_multi_choice_field = RegistrationFormField(parent=fields.user_section, registration_form=dummy_regform)
     _fill_form_field_with_data(new_multi_choice_field, {
         'input_type': 'multi_choice', 'with_extra_slots': False, 'title': 'Multi Choice',
         'choices': [
@@ -611,25 +577,28 @@ def test_modify_registration(monkeypatch, dummy_user, dummy_regform):
 
     modify_registration(reg, {}, management=False, notify_user=False)
 
-    assert reg.data_by_field[boolean_field.id].data
-    assert reg.data_by_field[multi_choice_field.id].data == {choice_uuid: 3}
-    assert not reg.data_by_field[checkbox_field.id].data
+    assert reg.data_by_field[fields.boolean_field.id].data
+    assert reg.data_by_field[fields.multi_choice_field.id].data == {fields.choice_uuid: 2}
+    assert reg.data_by_field[fields.checkbox_field.id].data
     # Assert that the new field got a default value
     assert reg.data_by_field[new_multi_choice_field.id].data == {}
 
+
+def test_modify_registration_deleted_field(regform_with_fields, modifiable_registration):
+    fields = regform_with_fields
+    reg = modifiable_registration
     # Remove a field after registering
-    multi_choice_field.is_deleted = True
+    fields.multi_choice_field.is_deleted = True
     db.session.flush()
 
     data = {
-        multi_choice_field.html_field_name: {choice_uuid: 7},
+        fields.multi_choice_field.html_field_name: {fields.choice_uuid: 7},
     }
     modify_registration(reg, data, management=True, notify_user=False)
-    assert reg.data_by_field[boolean_field.id].data
+    assert reg.data_by_field[fields.boolean_field.id].data
     # Assert that the removed field keeps its old value
-    assert reg.data_by_field[multi_choice_field.id].data == {choice_uuid: 3}
-    assert not reg.data_by_field[checkbox_field.id].data
-    assert reg.data_by_field[new_multi_choice_field.id].data == {}
+    assert reg.data_by_field[fields.multi_choice_field.id].data == {fields.choice_uuid: 2}
+    assert reg.data_by_field[fields.checkbox_field.id].data
 
 
 @pytest.mark.usefixtures('request_context')
@@ -647,10 +616,16 @@ def test_modify_registration_update_consent(dummy_reg):
     assert dummy_reg.consent_to_publish == RegistrationVisibility.all
 
 
-@pytest.mark.usefixtures('request_context')
-def test_get_user_data(monkeypatch, dummy_event, dummy_user, dummy_regform):
-    monkeypatch.setattr('indico.modules.events.registration.util.notify_invitation', lambda *args, **kwargs: None)
+@pytest.fixture
+def session_user(request_context, dummy_user):
+    """Log in the dummy user via the session."""
     session.set_session_user(dummy_user)
+    yield dummy_user
+    session.set_session_user(None)
+
+
+@pytest.mark.usefixtures('session_user')
+def test_get_user_data(dummy_event, dummy_user, dummy_regform):
 
     assert get_user_data(dummy_regform, None) == {}
 
@@ -734,10 +709,13 @@ def test_get_ticket_qr_code_data(request, mocker, snapshot, dummy_reg, url, tick
     assert_json_snapshot(snapshot, data, f'ticket_qr_code_data-{request.node.callspec.id}.json')
 
 
-def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform):
-    monkeypatch.setattr('indico.modules.users.util.get_user_by_email', lambda *args, **kwargs: dummy_user)
+@pytest.fixture
+def conditional_fields(dummy_regform):
+    """Extend the dummy registration form with a chain of conditional fields.
 
-    # Extend the dummy_regform with more sections and fields
+    The second boolean field is only shown if the first one is checked,
+    and the text field is only shown if the second one is unchecked.
+    """
     section = RegistrationFormSection(registration_form=dummy_regform, title='dummy_section', is_manager_only=False)
 
     boolean_field = RegistrationFormField(parent=section, registration_form=dummy_regform)
@@ -761,6 +739,14 @@ def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform)
         'show_if_field_values': [False],
     })
     db.session.flush()
+    return SimpleNamespace(boolean_field=boolean_field, boolean_field_2=boolean_field_2, text_field=text_field)
+
+
+def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform, conditional_fields):
+    monkeypatch.setattr('indico.modules.users.util.get_user_by_email', lambda *args, **kwargs: dummy_user)
+    boolean_field = conditional_fields.boolean_field
+    boolean_field_2 = conditional_fields.boolean_field_2
+    text_field = conditional_fields.text_field
 
     personal_data = {'email': dummy_user.email, 'first_name': dummy_user.first_name, 'last_name': dummy_user.last_name}
 
@@ -771,12 +757,12 @@ def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform)
         boolean_field.html_field_name: False,
         text_field.html_field_name: 'meow',
     }
+    savepoint = db.session.begin_nested()
     reg = create_registration(dummy_regform, data, invitation=None, management=False, notify_user=False)
 
     assert not reg.data_by_field[boolean_field.id].data
     assert text_field.id not in reg.data_by_field  # disabled conditional field cannot have data
-    db.session.delete(reg)
-    db.session.flush()
+    savepoint.rollback()
 
     # Register with the conditional field disabled, but data present. This is ignored here because it's only
     # actively rejected on the schema level, while being silently ignored in create_registration
@@ -786,13 +772,13 @@ def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform)
         boolean_field_2.html_field_name: True,
         text_field.html_field_name: 'meow',
     }
+    savepoint = db.session.begin_nested()
     reg = create_registration(dummy_regform, data, invitation=None, management=False, notify_user=False)
 
     assert reg.data_by_field[boolean_field.id].data
     assert reg.data_by_field[boolean_field_2.id].data
     assert text_field.id not in reg.data_by_field  # disabled conditional field cannot have data
-    db.session.delete(reg)
-    db.session.flush()
+    savepoint.rollback()
 
     # Same as above, but omitting the data. This should also not satisfy the text field condition since it
     # expects `False` ("No") for the boolean field, but no value is present.
@@ -801,13 +787,13 @@ def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform)
         boolean_field.html_field_name: True,
         text_field.html_field_name: 'meow',
     }
+    savepoint = db.session.begin_nested()
     reg = create_registration(dummy_regform, data, invitation=None, management=False, notify_user=False)
 
     assert reg.data_by_field[boolean_field.id].data
     assert reg.data_by_field[boolean_field_2.id].data is None
     assert text_field.id not in reg.data_by_field  # disabled conditional field cannot have data
-    db.session.delete(reg)
-    db.session.flush()
+    savepoint.rollback()
 
     # With both fields having the correct value, the text field should be stored now
     data = {
@@ -824,33 +810,17 @@ def test_create_registration_conditional(monkeypatch, dummy_user, dummy_regform)
 
 
 @pytest.mark.usefixtures('request_context')
-def test_modify_registration_conditional(monkeypatch, dummy_user, dummy_regform):
+@pytest.mark.parametrize('modify_data', (
+    # Try setting a value for the hidden field
+    {'text_field': 'meow'},
+    # Try setting values for the hidden fields while still failing the conditions
+    {'boolean_field': False, 'boolean_field_2': True, 'text_field': 'meow'},
+))
+def test_modify_registration_conditional(monkeypatch, dummy_user, dummy_regform, conditional_fields, modify_data):
     monkeypatch.setattr('indico.modules.users.util.get_user_by_email', lambda *args, **kwargs: dummy_user)
-
-    # Extend the dummy_regform with more sections and fields
-    section = RegistrationFormSection(registration_form=dummy_regform, title='dummy_section', is_manager_only=False)
-
-    boolean_field = RegistrationFormField(parent=section, registration_form=dummy_regform)
-    _fill_form_field_with_data(boolean_field, {
-        'input_type': 'bool', 'default_value': False, 'title': 'Bool 1'
-    })
-    db.session.flush()
-
-    boolean_field_2 = RegistrationFormField(parent=section, registration_form=dummy_regform)
-    _fill_form_field_with_data(boolean_field_2, {
-        'input_type': 'bool', 'title': 'Bool 2',
-        'show_if_field_id': boolean_field.id,
-        'show_if_field_values': [True],
-    })
-    db.session.flush()
-
-    text_field = RegistrationFormField(parent=section, registration_form=dummy_regform)
-    _fill_form_field_with_data(text_field, {
-        'input_type': 'text', 'title': 'Cond Text',
-        'show_if_field_id': boolean_field_2.id,
-        'show_if_field_values': [False],
-    })
-    db.session.flush()
+    boolean_field = conditional_fields.boolean_field
+    boolean_field_2 = conditional_fields.boolean_field_2
+    text_field = conditional_fields.text_field
 
     personal_data = {'email': dummy_user.email, 'first_name': dummy_user.first_name, 'last_name': dummy_user.last_name}
 
@@ -877,22 +847,8 @@ def test_modify_registration_conditional(monkeypatch, dummy_user, dummy_regform)
     assert boolean_field_2.id not in reg.data_by_field  # data is deleted for hidden field
     assert text_field.id not in reg.data_by_field  # data is deleted for hidden field
 
-    # Modify the registration and try setting value for hidden field
-    data = {
-        text_field.html_field_name: 'meow',
-    }
-    modify_registration(reg, data, management=False, notify_user=False)
-
-    assert not reg.data_by_field[boolean_field.id].data
-    assert boolean_field_2.id not in reg.data_by_field
-    assert text_field.id not in reg.data_by_field
-
-    # Modify the registration and try setting value for hidden field while still failing the conditions
-    data = {
-        boolean_field.html_field_name: False,
-        boolean_field_2.html_field_name: True,  # should not be set
-        text_field.html_field_name: 'meow',
-    }
+    # Modify the registration again, which must not bring back any data for the hidden fields
+    data = {getattr(conditional_fields, name).html_field_name: value for name, value in modify_data.items()}
     modify_registration(reg, data, management=False, notify_user=False)
 
     assert not reg.data_by_field[boolean_field.id].data
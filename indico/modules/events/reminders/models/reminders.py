@@ -5,9 +5,11 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
-from sqlalchemy import func
+from itertools import chain
+
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import contains_eager, selectinload
 
 from indico.core import signals
 from indico.core.config import config
@@ -16,12 +18,15 @@ from indico.core.db.sqlalchemy import PyIntEnum, UTCDateTime
 from indico.core.db.sqlalchemy.descriptions import RenderMode, RenderModeMixin
 from indico.core.notifications import make_email, send_email
 from indico.modules.core.settings import core_settings
+from indico.modules.events.contributions.models.contributions import Contribution
 from indico.modules.events.contributions.models.persons import ContributionPersonLink, SubContributionPersonLink
 from indico.modules.events.contributions.models.subcontributions import SubContribution
 from indico.modules.events.ical import MIMECalendar, event_to_ical
 from indico.modules.events.models.events import EventType
+from indico.modules.events.models.persons import EventPerson, EventPersonLink
 from indico.modules.events.registration.models.forms import RegistrationForm
 from indico.modules.events.registration.models.registrations import Registration, registrations_tags_table
+from indico.modules.events.registration.models.tags import RegistrationTag
 from indico.modules.events.reminders import logger
 from indico.modules.events.reminders.util import get_reminder_email_tpl
 from indico.util.date_time import now_utc
@@ -44,7 +49,6 @@ reminders_forms_table = db.Table(
         db.ForeignKey('events.reminders.id', ondelete='CASCADE'),
         primary_key=True,
         nullable=False,
-        index=True,
     ),
     db.Column(
         'reminder_form_id',
@@ -67,7 +71,6 @@ reminders_tags_table = db.Table(
         db.ForeignKey('events.reminders.id', ondelete='CASCADE'),
         primary_key=True,
         nullable=False,
-        index=True,
     ),
     db.Column(
         'reminder_tag_id',
@@ -86,6 +89,7 @@ class EventReminder(RenderModeMixin, db.Model):
 
     __tablename__ = 'reminders'
     __table_args__ = (db.Index(None, 'scheduled_dt', postgresql_where=db.text('not is_sent')),
+                      db.Index(None, 'recipients', postgresql_using='gin'),
                       db.CheckConstraint('(event_start_delta IS NULL) OR (event_end_delta IS NULL)',
                                          name='event_start_delta_or_end_delta_is_null'),
                       {'schema': 'events'})
@@ -257,6 +261,27 @@ class EventReminder(RenderModeMixin, db.Model):
     def locator(self):
         return dict(self.event.locator, reminder_id=self.id)
 
+    @classmethod
+    def overdue(cls, now=None):
+        """Get a query for all unsent reminders which are due.
+
+        :param now: The reference time; defaults to the current time
+        """
+        return cls.query.filter(~cls.is_sent, cls.scheduled_dt <= (now or now_utc()))
+
+    @classmethod
+    def get_pending(cls):
+        """Get a query for all overdue reminders that need to be sent.
+
+        The query joins the event and preloads everything needed to
+        determine the recipients of each reminder.
+        """
+        return (cls.overdue()
+                .join(cls.event)
+                .options(contains_eager(cls.event),
+                         selectinload(cls.forms),
+                         selectinload(cls.tags)))
+
     @property
     def all_recipients(self):
         """Return all recipients of the notifications.
@@ -264,62 +289,85 @@ class EventReminder(RenderModeMixin, db.Model):
         This includes both explicit recipients and, if enabled,
         participants/speakers of the event.
         """
-        recipients = set(self.recipients)
+        if not self.send_to_participants and not self.send_to_speakers:
+            return {email for email in self.recipients if email}
+        email_queries = []
         if self.send_to_participants:
             regs_query = (self.event.registrations
                           .join(Registration.registration_form)
                           .filter(Registration.is_active,
-                                  ~RegistrationForm.is_deleted))
+                                  ~RegistrationForm.is_deleted,
+                                  Registration.email != ''))  # noqa: PLC1901
             if self.forms:
                 form_ids = [form.id for form in self.forms]
                 regs_query = regs_query.filter(RegistrationForm.id.in_(form_ids))
-            if self.tags:
+            if len(self.tags) == 1:
+                # with a single tag "all" and "any" are the same, so we can simply join the tags table
+                tag_id = next(iter(self.tags)).id
+                regs_query = (regs_query
+                              .join(registrations_tags_table,
+                                    registrations_tags_table.c.registration_id == Registration.id)
+                              .filter(registrations_tags_table.c.registration_tag_id == tag_id))
+            elif self.tags:
                 tag_ids = [tag.id for tag in self.tags]
                 if self.all_tags:
-                    tags_query = (db.session.query(registrations_tags_table.c.registration_id)
-                                  .filter(registrations_tags_table.c.registration_tag_id.in_(tag_ids))
-                                  .group_by(registrations_tags_table.c.registration_id)
-                                  .having(func.count(registrations_tags_table.c.registration_id) == len(tag_ids)))
+                    # registrations for which none of the selected tags is missing
+                    missing_tags = (db.select(RegistrationTag.id)
+                                    .where(RegistrationTag.id.in_(tag_ids),
+                                           ~db.exists()
+                                           .where(registrations_tags_table.c.registration_id == Registration.id,
+                                                  registrations_tags_table.c.registration_tag_id == RegistrationTag.id)
+                                           .correlate_except(registrations_tags_table)))
+                    regs_query = regs_query.filter(~missing_tags.exists())
                 else:
                     tags_query = (db.session.query(registrations_tags_table.c.registration_id.distinct())
                                   .filter(registrations_tags_table.c.registration_tag_id.in_(tag_ids)))
-                regs_query = regs_query.filter(Registration.id.in_(tags_query))
+                    regs_query = regs_query.filter(Registration.id.in_(tags_query))
 
-            recipients.update(reg.email for reg in regs_query)
+            email_queries.append(regs_query.with_entities(Registration.email))
 
         if self.send_to_speakers:
-            recipients.update(person_link.email for person_link in self.event.person_links)
+            email_queries.append(EventPersonLink.query
+                                 .join(EventPersonLink.person)
+                                 .filter(EventPersonLink.event_id == self.event_id,
+                                         EventPerson.email != '')  # noqa: PLC1901
+                                 .with_entities(EventPerson.email))
 
             # contribution/sub-contribution speakers are present only in meetings and conferences
-            if self.event.type != EventType.lecture:
+            if self.event.type_ != EventType.lecture:
                 contrib_speakers = (
                     ContributionPersonLink.query
+                    .join(ContributionPersonLink.person)
+                    .join(ContributionPersonLink.contribution)
                     .filter(
                         ContributionPersonLink.is_speaker,
-                        ContributionPersonLink.contribution.has(is_deleted=False, event=self.event)
+                        Contribution.event_id == self.event_id,
+                        ~Contribution.is_deleted,
+                        EventPerson.email != ''  # noqa: PLC1901
                     )
-                    .all()
+                    .with_entities(EventPerson.email)
                 )
 
                 subcontrib_speakers = (
                     SubContributionPersonLink.query
+                    .join(SubContributionPersonLink.person)
+                    .join(SubContributionPersonLink.subcontribution)
+                    .join(SubContribution.contribution)
                     .filter(
                         SubContributionPersonLink.is_speaker,
-                        SubContributionPersonLink.subcontribution.has(
-                            db.and_(
-                                ~SubContribution.is_deleted,
-                                SubContribution.contribution.has(is_deleted=False, event=self.event)
-                            )
-                        )
+                        Contribution.event_id == self.event_id,
+                        ~SubContribution.is_deleted,
+                        ~Contribution.is_deleted,
+                        EventPerson.email != ''  # noqa: PLC1901
                     )
-                    .all()
+                    .with_entities(EventPerson.email)
                 )
 
-                recipients.update(speaker.email for speaker in contrib_speakers)
-                recipients.update(speaker.email for speaker in subcontrib_speakers)
+                email_queries += [contrib_speakers, subcontrib_speakers]
 
-        recipients.discard('')  # just in case there was an empty email address somewhere
-        return recipients
+        # a single UNION query to get the (already deduplicated) emails from all sources
+        emails_query = email_queries[0].union(*email_queries[1:])
+        return set(chain(filter(None, self.recipients), (email for email, in emails_query)))
 
     @hybrid_property
     def is_start_time_relative(self):
@@ -352,9 +400,9 @@ class EventReminder(RenderModeMixin, db.Model):
     def is_overdue(self):
         return not self.is_sent and self.scheduled_dt <= now_utc()
 
-    def _make_email(self, sender, recipient, template, attachments, html, alternatives):
+    def _get_email_params(self, sender, template, attachments, html, alternatives):
         email_params = {
-            'to_list': recipient,
+            'to_list': None,
             'sender_address': sender,
             'template': template,
             'attachments': attachments,
@@ -364,7 +412,7 @@ class EventReminder(RenderModeMixin, db.Model):
         extra_params = signals.event.reminder.before_reminder_make_email.send(self, **email_params)
         for param in values_from_signal(extra_params, as_list=True):
             email_params.update(param)
-        return make_email(**email_params)
+        return email_params
 
     def send(self):
         """Send the reminder to its recipients."""
@@ -385,10 +433,13 @@ class EventReminder(RenderModeMixin, db.Model):
 
         sender = self.event.get_verbose_email_sender(self.reply_to_address)
         alternatives = [(text_email_tpl.get_body(), 'text/plain')] if html_email_tpl and text_email_tpl else None
+        with self.event.force_event_locale():
+            # signal receivers may translate strings, so they need the event's locale as well
+            email_params = self._get_email_params(sender, html_email_tpl or text_email_tpl, attachments,
+                                                  html=bool(html_email_tpl), alternatives=alternatives)
         for recipient in recipients:
             with self.event.force_event_locale():
-                email = self._make_email(sender, recipient, html_email_tpl or text_email_tpl, attachments,
-                                         html=bool(html_email_tpl), alternatives=alternatives)
+                email = make_email(**{**email_params, 'to_list': recipient})
             send_email(email, self.event, 'Reminder', self.creator, log_metadata={'reminder_id': self.id})
 
     def __repr__(self):
@@ -0,0 +1,194 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2025 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import timedelta
+
+import pytest
+
+from indico.core import signals
+from indico.modules.events.contributions.models.persons import ContributionPersonLink, SubContributionPersonLink
+from indico.modules.events.models.events import EventType
+from indico.modules.events.models.persons import EventPerson, EventPersonLink
+from indico.modules.events.registration.models.registrations import Registration, RegistrationState
+from indico.modules.events.registration.models.tags import RegistrationTag
+from indico.modules.events.reminders.models.reminders import EventReminder, ReminderType
+from indico.util.date_time import now_utc
+
+
+pytest_plugins = 'indico.modules.events.registration.testing.fixtures'
+
+
+@pytest.fixture
+def create_reminder(db, dummy_user, dummy_event):
+    """Return a callable that lets you create a reminder."""
+    def _create_reminder(event=dummy_event, **kwargs):
+        kwargs.setdefault('scheduled_dt', now_utc() - timedelta(minutes=5))
+        reminder = EventReminder(event=event, creator=dummy_user, reply_to_address='noreply@example.test',
+                                 reminder_type=ReminderType.standard, **kwargs)
+        db.session.add(reminder)
+        db.session.flush()
+        return reminder
+
+    return _create_reminder
+
+
+@pytest.fixture
+def create_reg(db, dummy_regform):
+    """Return a callable that lets you create a registration with tags."""
+    def _create_reg(email, regform=dummy_regform, tags=(), state=RegistrationState.complete):
+        reg = Registration(first_name='Guinea', last_name='Pig', email=email, currency='USD', state=state,
+                           registration_form=regform, tags=set(tags))
+        db.session.add(reg)
+        db.session.flush()
+        return reg
+
+    return _create_reg
+
+
+@pytest.fixture
+def create_tag(db, dummy_event):
+    """Return a callable that lets you create a registration tag."""
+    def _create_tag(title):
+        tag = RegistrationTag(title=title, color='b33f69', event=dummy_event)
+        db.session.add(tag)
+        db.session.flush()
+        return tag
+
+    return _create_tag
+
+
+def _create_person(event, email):
+    return EventPerson(event=event, first_name='Guinea', last_name='Pig', email=email)
+
+
+def test_all_recipients_explicit_only(create_reminder, count_queries):
+    reminder = create_reminder(recipients=['a@example.test', '', None, 'b@example.test'])
+    with count_queries() as count:
+        assert reminder.all_recipients == {'a@example.test', 'b@example.test'}
+    assert count() == 0
+
+
+def test_all_recipients_participants(db, dummy_event, dummy_regform, create_regform, create_reminder, create_reg):
+    other_regform = create_regform(dummy_event, title='Other Form')
+    deleted_regform = create_regform(dummy_event, title='Deleted Form')
+    create_reg('a@example.test')
+    create_reg('b@example.test', regform=other_regform)
+    create_reg('c@example.test', regform=deleted_regform)
+    create_reg('')
+    create_reg('withdrawn@example.test', state=RegistrationState.withdrawn)
+    create_reg('rejected@example.test', state=RegistrationState.rejected)
+    create_reg('deleted@example.test').is_deleted = True
+    deleted_regform.is_deleted = True
+    db.session.flush()
+
+    reminder = create_reminder(recipients=['a@example.test', 'x@example.test'], send_to_participants=True)
+    assert reminder.all_recipients == {'a@example.test', 'b@example.test', 'x@example.test'}
+    reminder.forms = {other_regform}
+    db.session.flush()
+    assert reminder.all_recipients == {'b@example.test', 'x@example.test'}
+
+
+@pytest.mark.parametrize(('tag_names', 'all_tags', 'expected'), (
+    (['foo'], False, {'foo@example.test', 'foo-bar@example.test'}),
+    (['foo'], True, {'foo@example.test', 'foo-bar@example.test'}),
+    (['foo', 'bar'], False, {'foo@example.test', 'bar@example.test', 'foo-bar@example.test'}),
+    (['foo', 'bar'], True, {'foo-bar@example.test'}),
+))
+def test_all_recipients_participants_tags(db, create_reminder, create_reg, create_tag, tag_names, all_tags,
+                                          expected):
+    tags = {t.title: t for t in (create_tag('foo'), create_tag('bar'), create_tag('baz'))}
+    create_reg('none@example.test')
+    create_reg('foo@example.test', tags=[tags['foo']])
+    create_reg('bar@example.test', tags=[tags['bar'], tags['baz']])
+    create_reg('foo-bar@example.test', tags=[tags['foo'], tags['bar']])
+    reminder = create_reminder(send_to_participants=True, all_tags=all_tags,
+                               tags={tags[name] for name in tag_names})
+    assert reminder.all_recipients == expected
+
+
+@pytest.mark.parametrize('event_type', (EventType.meeting, EventType.lecture))
+def test_all_recipients_speakers(db, dummy_event, create_reminder, create_contribution, create_subcontribution,
+                                 event_type):
+    dummy_event.type_ = event_type
+    dummy_event.person_links.append(EventPersonLink(person=_create_person(dummy_event, 'event@example.test')))
+    dummy_event.person_links.append(EventPersonLink(person=_create_person(dummy_event, '')))
+
+    def _add_contrib_speaker(contrib, email, is_speaker=True):
+        person = _create_person(dummy_event, email)
+        contrib.person_links.append(ContributionPersonLink(person=person, is_speaker=is_speaker))
+
+    def _add_subcontrib_speaker(subcontrib, email):
+        person = _create_person(dummy_event, email)
+        subcontrib.person_links.append(SubContributionPersonLink(person=person))
+
+    contrib = create_contribution(dummy_event, 'Contrib')
+    deleted_contrib = create_contribution(dummy_event, 'Deleted Contrib')
+    _add_contrib_speaker(contrib, 'contrib@example.test')
+    _add_contrib_speaker(contrib, 'author@example.test', is_speaker=False)
+    _add_contrib_speaker(deleted_contrib, 'deleted-contrib@example.test')
+    subcontrib = create_subcontribution(contrib, 'Subcontrib')
+    deleted_subcontrib = create_subcontribution(contrib, 'Deleted Subcontrib')
+    subcontrib_in_deleted = create_subcontribution(deleted_contrib, 'Subcontrib in deleted Contrib')
+    _add_subcontrib_speaker(subcontrib, 'subcontrib@example.test')
+    _add_subcontrib_speaker(deleted_subcontrib, 'deleted-subcontrib@example.test')
+    _add_subcontrib_speaker(subcontrib_in_deleted, 'deleted-contrib-subcontrib@example.test')
+    deleted_contrib.is_deleted = True
+    deleted_subcontrib.is_deleted = True
+    db.session.flush()
+
+    reminder = create_reminder(send_to_speakers=True)
+    if event_type == EventType.lecture:
+        assert reminder.all_recipients == {'event@example.test'}
+    else:
+        assert reminder.all_recipients == {'event@example.test', 'contrib@example.test', 'subcontrib@example.test'}
+
+
+def test_all_recipients_duplicates(db, dummy_event, create_reminder, create_reg, create_contribution):
+    create_reg('dup@example.test')
+    person = _create_person(dummy_event, 'dup@example.test')
+    dummy_event.person_links.append(EventPersonLink(person=person))
+    contrib = create_contribution(dummy_event, 'Contrib')
+    contrib.person_links.append(ContributionPersonLink(person=person, is_speaker=True))
+    db.session.flush()
+    reminder = create_reminder(recipients=['dup@example.test'], send_to_participants=True, send_to_speakers=True)
+    assert reminder.all_recipients == {'dup@example.test'}
+
+
+def test_overdue_and_pending(db, dummy_event, create_reminder):
+    now = now_utc()
+    overdue = create_reminder(scheduled_dt=now - timedelta(hours=1))
+    create_reminder(scheduled_dt=now + timedelta(hours=1))
+    create_reminder(scheduled_dt=now - timedelta(hours=2), is_sent=True)
+    assert EventReminder.overdue().all() == [overdue]
+    assert EventReminder.overdue(now - timedelta(days=1)).all() == []
+    assert EventReminder.get_pending().all() == [overdue]
+    # get_pending loads the event together with the reminder
+    db.session.expire(overdue)
+    pending = EventReminder.get_pending().one()
+    assert 'event' in pending.__dict__
+    assert pending.event == dummy_event
+
+
+def test_send_make_email_signal(db, mocker, create_reminder):
+    make_email = mocker.patch('indico.modules.events.reminders.models.reminders.make_email')
+    send_email = mocker.patch('indico.modules.events.reminders.models.reminders.send_email')
+    calls = []
+
+    def _signal_fn(sender, **kwargs):
+        calls.append(kwargs)
+        return {'sender_address': 'custom@example.test'}
+
+    reminder = create_reminder(recipients=['a@example.test', 'b@example.test'], attach_ical=False)
+    with signals.event.reminder.before_reminder_make_email.connected_to(_signal_fn):
+        reminder.send()
+
+    assert reminder.is_sent
+    assert len(calls) == 1
+    assert calls[0]['to_list'] is None
+    assert {c.kwargs['to_list'] for c in make_email.call_args_list} == {'a@example.test', 'b@example.test'}
+    assert all(c.kwargs['sender_address'] == 'custom@example.test' for c in make_email.call_args_list)
+    assert send_email.call_count == 2
@@ -8,6 +8,7 @@
 from flask import session
 
 from indico.core import signals
+from indico.core.db import db
 from indico.core.logger import Logger
 from indico.core.notifications import make_email, send_email
 from indico.core.settings import SettingsProxy
@@ -105,6 +106,14 @@ def _registered(user, identity, from_moderation, **kwargs):
     send_email(email)
 
 
+@signals.core.after_commit.connect
+def _after_commit(sender, **kwargs):
+    # only clear the cache once the changes are visible to other requests
+    if db.session.info.pop('predefined_affiliations_changed', False):
+        from indico.modules.users.util import has_predefined_affiliations
+        has_predefined_affiliations.clear_cached()
+
+
 @signals.core.import_tasks.connect
 def _import_tasks(sender, **kwargs):
     import indico.modules.users.tasks  # noqa: F401
@@ -6,18 +6,19 @@
 # LICENSE file for more details.
 
 from collections import namedtuple
+from heapq import nsmallest
 from io import BytesIO
 from operator import attrgetter
 from urllib.parse import urlsplit
 from uuid import uuid4
 
 from dateutil.relativedelta import relativedelta
-from flask import flash, jsonify, redirect, render_template, request, session
+from flask import flash, jsonify, redirect, request, session
 from itsdangerous import BadSignature
 from markupsafe import Markup, escape
 from marshmallow import fields
 from PIL import Image
-from sqlalchemy.orm import joinedload, load_only, subqueryload
+from sqlalchemy.orm import joinedload, load_only, raiseload, subqueryload, undefer
 from sqlalchemy.orm.exc import StaleDataError
 from webargs import validate
 from werkzeug.exceptions import BadRequest, Forbidden, NotFound
@@ -46,7 +47,6 @@ from indico.modules.users import User, logger, user_management_settings
 from indico.modules.users.export_schemas import DataExportRequestSchema
 from indico.modules.users.forms import (AdminAccountRegistrationForm, AdminsForm, AdminUserSettingsForm, MergeForm,
                                         SearchForm, UserEmailsForm, UserPreferencesForm)
-from indico.modules.users.models.affiliations import Affiliation
 from indico.modules.users.models.emails import UserEmail
 from indico.modules.users.models.export import DataExportOptions, DataExportRequestState
 from indico.modules.users.models.users import ProfilePictureSource, UserTitle
@@ -55,9 +55,10 @@ from indico.modules.users.schemas import (AffiliationSchema, BasicCategorySchema
                                           UserPersonalDataSchema)
 from indico.modules.users.util import (get_avatar_url_from_name, get_gravatar_for_user, get_linked_events,
                                        get_mastodon_server_name, get_related_categories, get_suggested_categories,
-                                       get_unlisted_events, get_user_by_email, get_user_titles, log_user_update,
-                                       merge_users, search_affiliations, search_users, send_avatar, serialize_user,
-                                       set_user_avatar)
+                                       get_unlisted_events, get_user_by_email, get_user_titles,
+                                       has_predefined_affiliations, log_user_update, merge_users,
+                                       render_default_avatar, search_affiliations, search_users, send_avatar,
+                                       serialize_user, set_user_avatar)
 from indico.modules.users.views import (WPUser, WPUserDashboard, WPUserDataExport, WPUserFavorites, WPUserPersonalData,
                                         WPUserProfilePic, WPUsersAdmin)
 from indico.util.date_time import now_utc
@@ -66,7 +67,7 @@ from indico.util.images import square
 from indico.util.marshmallow import HumanizedDate, ModelField, Principal, validate_with_message
 from indico.util.signals import values_from_signal
 from indico.util.signing import static_secure_serializer
-from indico.util.string import make_unique_token, remove_accents
+from indico.util.string import remove_accents
 from indico.util.user import make_user_search_token, validate_search_token
 from indico.web.args import use_args, use_kwargs
 from indico.web.flask.templating import get_template_module
@@ -78,8 +79,13 @@ from indico.web.util import (ExpectedError, is_legacy_signed_url_valid, jsonify_
                              strip_path_from_url)
 
 
+MAX_PROFILE_PICTURE_PIXELS = 50_000_000
 IDENTITY_ATTRIBUTES = {'first_name', 'last_name', 'email', 'affiliation', 'full_name'}
 UserEntry = namedtuple('UserEntry', IDENTITY_ATTRIBUTES | {'profile_url', 'avatar_url', 'user'})
+# Load only what's needed to show an event's room (and location)
+ROOM_STRATEGY = (joinedload('own_room')
+                 .options(raiseload('*'), joinedload('location').load_only('id', 'room_name_format'))
+                 .load_only('id', 'location_id', 'site', 'building', 'floor', 'number', 'verbose_name'))
 
 
 def get_events_in_categories(category_ids, user, from_, limit=10):
@@ -88,10 +94,6 @@ def get_events_in_categories(category_ids, user, from_, limit=10):
     # Find events (past and future) which are closest to the current time
     time_delta = now_utc(False) - Event.start_dt
     absolute_time_delta = db.func.abs(db.func.extract('epoch', time_delta))
-    _room_strategy = joinedload('own_room')
-    _room_strategy.raiseload('*')
-    _room_strategy.joinedload('location').load_only('id', 'room_name_format')
-    _room_strategy.load_only('id', 'location_id', 'site', 'building', 'floor', 'number', 'verbose_name')
     query = (Event.query
              .filter(~Event.is_deleted,
                      Event.category_chain_overlaps(category_ids),
@@ -99,7 +101,7 @@ def get_events_in_categories(category_ids, user, from_, limit=10):
              .options(joinedload('category').load_only('id', 'title', 'protection_mode'),
                       joinedload('series'),
                       joinedload('label'),
-                      _room_strategy,
+                      ROOM_STRATEGY,
                       joinedload('own_venue').load_only('id', 'name'),
                       subqueryload('acl_entries'),
                       load_only('id', 'category_id', 'start_dt', 'end_dt', 'title', 'access_key',
@@ -107,7 +109,16 @@ def get_events_in_categories(category_ids, user, from_, limit=10):
                                 'label_id', 'label_message', 'description', 'own_room_id', 'own_venue_id',
                                 'own_room_name', 'own_venue_name'))
              .order_by(absolute_time_delta, Event.id))
-    return get_n_matching(query, limit, lambda x: x.can_access(user))
+    preloaded_categories = set()
+
+    def _preload_categories(events):
+        # load the category chains of all the events (with their acls) at once, so
+        # checking access on inheriting events does not lazy-load every parent
+        chain_query = Category._get_chain_query(Category.id.in_({e.category_id for e in events}))
+        preloaded_categories.update(chain_query.options(load_only('id', 'parent_id', 'protection_mode'),
+                                                        subqueryload('acl_entries')))
+
+    return get_n_matching(query, limit, lambda x: x.can_access(user), preload_bulk=_preload_categories)
 
 
 class RHUserBase(RHProtected):
@@ -159,9 +170,9 @@ class RHUserDashboard(RHUserBase):
             category_ids = {c['categ'].id for c in categories.values()}
             categories_events = get_events_in_categories(category_ids, self.user, now_utc(False))
         from_dt = now_utc(False) - relativedelta(weeks=1, hour=0, minute=0, second=0)
-        linked_events = [(event, {'management': bool(roles & self.management_roles),
-                                  'reviewing': bool(roles & self.reviewer_roles),
-                                  'attendance': bool(roles & self.attendance_roles),
+        linked_events = [(event, {'management': not roles.isdisjoint(self.management_roles),
+                                  'reviewing': not roles.isdisjoint(self.reviewer_roles),
+                                  'attendance': not roles.isdisjoint(self.attendance_roles),
                                   'favorited': 'favorited' in roles})
                          for event, roles in get_linked_events(self.user, from_dt, 10).items()]
         return WPUserDashboard.render_template('dashboard.html', 'dashboard',
@@ -189,17 +200,13 @@ class RHExportDashboardICS(RHProtected):
         all_events = set()
 
         if 'linked' in include:
-            _room_strategy = joinedload('own_room')
-            _room_strategy.raiseload('*')
-            _room_strategy.joinedload('location').load_only('id', 'room_name_format')
-            _room_strategy.load_only('id', 'location_id', 'site', 'building', 'floor', 'number', 'verbose_name')
             all_events |= set(get_linked_events(
                 user,
                 from_,
                 limit=limit,
                 load_also=('description', 'own_room_id', 'own_venue_id', 'own_room_name', 'own_venue_name'),
                 extra_options=(
-                    _room_strategy,
+                    ROOM_STRATEGY,
                     joinedload('own_venue').load_only('id', 'name'),
                 )
             ))
@@ -209,7 +216,8 @@ class RHExportDashboardICS(RHProtected):
             cats_from = from_ or (now - relativedelta(months=2, hour=0, minute=0, second=0))
             all_events |= set(get_events_in_categories(category_ids, user, cats_from, limit=limit*10))
 
-        all_events = sorted(all_events, key=lambda e: (abs(now - e.start_dt), e.id))[:limit]
+        now_ts = now.timestamp()
+        all_events = nsmallest(limit, all_events, key=lambda e: (abs(now_ts - e.start_dt.timestamp()), e.id))
 
         response = {'results': [serialize_event_for_ical(event) for event in all_events]}
         serializer = Serializer.create('ics')
@@ -240,13 +248,12 @@ class RHPersonalData(RHUserBase):
         current_affiliation = None
         if self.user.affiliation_link:
             current_affiliation = AffiliationSchema().dump(self.user.affiliation_link)
-        has_predefined_affiliations = Affiliation.query.filter(~Affiliation.is_deleted).has_rows()
         allow_custom_affiliations = not user_management_settings.get('only_predefined_affiliations')
         return WPUserPersonalData.render_template('personal_data.html', 'personal_data', user=self.user,
                                                   titles=titles, user_values=user_values, locked_fields=locked_fields,
                                                   locked_field_message=multipass.locked_field_message,
                                                   current_affiliation=current_affiliation,
-                                                  has_predefined_affiliations=has_predefined_affiliations,
+                                                  has_predefined_affiliations=has_predefined_affiliations(),
                                                   allow_custom_affiliations=allow_custom_affiliations,
                                                   allow_deletion=config.ALLOW_ADMIN_USER_DELETION)
 
@@ -305,12 +312,15 @@ class RHPersonalDataUpdate(RHUserBase):
         # informing the user about the changes made by the sync
         old_synced_fields = self.user.synced_fields
         self.user.synced_fields = synced_fields & syncable_fields
+        new_synced_fields = self.user.synced_fields
         changes = {}
-        if old_synced_fields != self.user.synced_fields:
-            changes['synced_fields'] = (old_synced_fields, self.user.synced_fields)
+        if old_synced_fields != new_synced_fields:
+            changes['synced_fields'] = (old_synced_fields, new_synced_fields)
         for key, value in updates.items():
+            if key in new_synced_fields:
+                continue
             old = getattr(self.user, key)
-            if key not in self.user.synced_fields and old != value:
+            if old != value:
                 changes[key] = (old, value)
                 setattr(self.user, key, value)
         changes.update(self.user.synchronize_data(refresh=True))
@@ -347,8 +357,8 @@ class RHProfilePicturePreview(RHUserBase):
     def _process(self, source):
         if source == ProfilePictureSource.standard:
             first_name = self.user.first_name[0].upper() if self.user.first_name else ''
-            avatar = render_template('users/avatar.svg', bg_color=self.user.avatar_bg_color, text=first_name)
-            return send_file('avatar.svg', BytesIO(avatar.encode()), mimetype='image/svg+xml',
+            avatar = render_default_avatar(self.user.avatar_bg_color, first_name)
+            return send_file('avatar.svg', BytesIO(avatar), mimetype='image/svg+xml',
                              no_cache=True, inline=True, safe=False)
         elif source == ProfilePictureSource.custom:
             metadata = self.user.picture_metadata
@@ -363,14 +373,15 @@ class RHProfilePictureDisplay(RH):
     """Display the user's profile picture."""
 
     def _process_args(self):
-        self.user = User.get_or_404(request.view_args['user_id'])
+        # check the signature first so invalid links never hit the database
         try:
             sig_user_id = static_secure_serializer.loads(request.view_args['signature'],
                                                          salt='user-profile-picture-display')
-            if self.user.id != sig_user_id:
-                raise NotFound
         except BadSignature:
             raise NotFound
+        if request.view_args['user_id'] != sig_user_id:
+            raise NotFound
+        self.user = User.get_or_404(sig_user_id)
 
     def _process(self):
         return send_avatar(self.user)
@@ -396,19 +407,24 @@ class RHSaveProfilePicture(RHUserBase):
             f = request.files['picture']
             try:
                 pic = Image.open(f)
-            except OSError:
+            except (OSError, Image.DecompressionBombError):
                 raise UserValueError(_('You cannot upload this file as profile picture.'))
             if pic.format.lower() not in {'jpeg', 'png', 'gif', 'webp'}:
                 raise UserValueError(_('The file has an invalid format ({format}).').format(format=pic.format))
+            # the size is known from the header, so we can reject huge images before decoding them
+            if pic.width * pic.height > MAX_PROFILE_PICTURE_PIXELS:
+                raise UserValueError(_('The image is too large.'))
+            # let the JPEG decoder downscale large images while loading them (no-op for other formats)
+            pic.draft('RGB', (256, 256))
             if pic.mode not in ('RGB', 'RGBA'):
                 pic = pic.convert('RGB')
             pic = square(pic)
             if pic.height > 256:
                 pic = pic.resize((256, 256), resample=Image.Resampling.BICUBIC)
             image_bytes = BytesIO()
-            pic.save(image_bytes, 'PNG')
-            image_bytes.seek(0)
-            set_user_avatar(self.user, image_bytes.read(), f.filename)
+            # fast compression is good enough for a small 256x256 image
+            pic.save(image_bytes, 'PNG', compress_level=1)
+            set_user_avatar(self.user, image_bytes.getvalue(), f.filename)
         else:
             content, lastmod = get_gravatar_for_user(self.user, source == ProfilePictureSource.identicon, 256)
             set_user_avatar(self.user, content, source.name, lastmod)
@@ -490,7 +506,8 @@ class RHUserFavoritesAPI(RHUserBase):
         self.fav_user = fav_user
 
     def _process_GET(self):
-        return jsonify(sorted(u.identifier for u in self.user.favorite_users))
+        # building the identifiers does not need the whole user rows
+        return jsonify(sorted(User.build_identifier(user_id) for user_id in self.user.favorite_user_ids))
 
     def _process_PUT(self):
         self.user.favorite_users.add(self.fav_user)
@@ -514,10 +531,18 @@ class RHUserFavoritesCategoryAPI(RHUserBase):
         )
 
     def _process_GET(self):
-        return jsonify({d.id: BasicCategorySchema().dump(d) for d in self.user.favorite_categories})
+        categories = (Category.query
+                      .with_parent(self.user, 'favorite_categories')
+                      .options(undefer('chain_titles'))
+                      .all())
+        schema = BasicCategorySchema()
+        return jsonify({c.id: schema.dump(c) for c in categories})
 
     def _process_PUT(self):
         if self.category not in self.user.favorite_categories:
+            # load the whole parent chain in one query so checking access on
+            # inheriting categories does not lazy-load each parent separately
+            self.category.parent_chain_query.all()
             if not self.category.can_access(self.user):
                 raise Forbidden
             self.user.favorite_categories.add(self.category)
@@ -549,7 +574,14 @@ class RHUserFavoritesEventAPI(RHUserBase):
         )
 
     def _process_GET(self):
-        return jsonify({e.id: FavoriteEventSchema().dump(e) for e in self.user.favorite_events if not e.is_deleted})
+        events = (Event.query
+                  .with_parent(self.user, 'favorite_events')
+                  .filter(~Event.is_deleted)
+                  .options(joinedload('category').undefer('chain_titles'),
+                           joinedload('label'))
+                  .all())
+        schema = FavoriteEventSchema()
+        return jsonify({e.id: schema.dump(e) for e in events})
 
     def _process_PUT(self):
         if self.event not in self.user.favorite_events:
@@ -583,7 +615,8 @@ class RHUserEmails(RHUserBase):
     def _send_confirmation(self, email):
         token_storage = make_scoped_cache('confirm-email')
         data = {'email': email, 'user_id': self.user.id}
-        token = make_unique_token(lambda t: not token_storage.get(t))
+        # collisions of random UUIDs are not a concern, so there's no need to check the storage first
+        token = str(uuid4())
         token_storage.set(token, data, timeout=86400)
         with self.user.force_user_locale():
             email_to_send = make_email(email, template=get_template_module('users/emails/verify_email.txt',
@@ -653,8 +686,11 @@ class RHUserEmailsVerify(RHUserBase):
 class RHUserEmailsDelete(RHUserBase):
     def _process(self):
         email = request.view_args['email']
-        if email in self.user.secondary_emails:
-            self.user.secondary_emails.remove(email)
+        # delete it directly instead of loading all secondary emails just to remove one of them
+        deleted = (UserEmail.query
+                   .filter_by(user_id=self.user.id, email=email, is_primary=False)
+                   .delete(synchronize_session='fetch'))
+        if deleted:
             self.user.log(UserLogRealm.user, LogKind.negative, 'Profile', 'Secondary email removed', session.user,
                           data={'Email': email})
         return jsonify(success=True)
@@ -685,14 +721,16 @@ class RHAdmins(RHAdminBase):
     """Show Indico administrators."""
 
     def _process(self):
-        admins = set(User.query
-                     .filter_by(is_admin=True, is_deleted=False)
-                     .order_by(db.func.lower(User.first_name), db.func.lower(User.last_name)))
-
-        form = AdminsForm(admins=admins)
+        admins_query = (User.query
+                        .filter_by(is_admin=True, is_deleted=False)
+                        .options(load_only('id', 'first_name', 'last_name', 'is_admin')))
+        # when submitting, the field is populated from the form data, so there is no need to load all admins
+        form = AdminsForm(admins=(set(admins_query) if request.method != 'POST' else None))
         if form.validate_on_submit():
-            added = form.admins.data - admins
-            removed = admins - form.admins.data
+            admin_ids = {id_ for id_, in admins_query.with_entities(User.id)}
+            added = {user for user in form.admins.data if user.id not in admin_ids}
+            removed_ids = admin_ids - {user.id for user in form.admins.data}
+            removed = set(admins_query.filter(User.id.in_(removed_ids))) if removed_ids else set()
             for user in added:
                 grant_admin(user)
                 flash(_('Admin added: {name} ({email})').format(name=user.name, email=user.email), 'success')
@@ -711,8 +749,12 @@ class RHUsersAdmin(RHAdminBase):
         form = SearchForm(obj=FormDefaults(exact=True))
         form_data = form.data
         search_results = None
-        num_of_users = User.query.count()
-        num_deleted_users = User.query.filter_by(is_deleted=True).count()
+        reg_requests_count = db.session.query(db.func.count(RegistrationRequest.id)).scalar_subquery()
+        num_of_users, num_deleted_users, num_reg_requests = (
+            db.session.query(db.func.count(User.id), db.func.count(User.id).filter(User.is_deleted),
+                             reg_requests_count)
+            .one()
+        )
 
         if form.validate_on_submit():
             search_results = []
@@ -747,7 +789,6 @@ class RHUsersAdmin(RHAdminBase):
                     ))
             search_results.sort(key=attrgetter('full_name'))
 
-        num_reg_requests = RegistrationRequest.query.count()
         return WPUsersAdmin.render_template('users_admin.html', 'users', form=form, search_results=search_results,
                                             num_of_users=num_of_users, num_deleted_users=num_deleted_users,
                                             num_reg_requests=num_reg_requests,
@@ -856,7 +897,11 @@ class RHRegistrationRequestList(RHAdminBase):
     """List all registration requests."""
 
     def _process(self):
-        requests = RegistrationRequest.query.order_by(RegistrationRequest.email).all()
+        # the list only shows the basic request details, so skip the identity data and settings
+        requests = (RegistrationRequest.query
+                    .options(load_only('id', 'email', 'comment', 'user_data'))
+                    .order_by(RegistrationRequest.email)
+                    .all())
         return WPUsersAdmin.render_template('registration_requests.html', 'users', pending_requests=requests)
 
 
@@ -912,6 +957,7 @@ class UserSearchResultSchema(mm.SQLAlchemyAutoSchema):
 
 
 search_result_schema = UserSearchResultSchema()
+affiliation_schema = AffiliationSchema()
 
 
 class RHUserSearchToken(RHProtected):
@@ -961,12 +1007,13 @@ class RHUserSearch(RHProtected):
         validate_search_token(token, session.user)
 
     def _serialize_pending_user(self, entry):
-        first_name = entry.data.get('first_name') or ''
-        last_name = entry.data.get('last_name') or ''
+        data = entry.data
+        first_name = data.get('first_name') or ''
+        last_name = data.get('last_name') or ''
         full_name = f'{first_name} {last_name}'.strip() or 'Unknown'
-        affiliation = entry.data.get('affiliation') or ''
-        affiliation_data = entry.data.get('affiliation_data')
-        email = entry.data['email'].lower()
+        affiliation = data.get('affiliation') or ''
+        affiliation_data = data.get('affiliation_data')
+        email = data['email'].lower()
         ext_id = f'{entry.provider.name}:{entry.identifier}'
         # IdentityInfo from flask-multipass does not have `avatar_url`
         avatar_url = get_avatar_url_from_name(first_name)
@@ -978,8 +1025,8 @@ class RHUserSearch(RHProtected):
             'email': email,
             'affiliation': affiliation,
             'affiliation_data': affiliation_data,
-            'phone': entry.data.get('phone') or '',
-            'address': entry.data.get('address') or '',
+            'phone': data.get('phone') or '',
+            'address': data.get('address') or '',
         }
         # simple data for the search results
         return {
@@ -989,7 +1036,7 @@ class RHUserSearch(RHProtected):
             'email': email,
             'affiliation': affiliation,
             'affiliation_id': -1 if affiliation_data else None,
-            'affiliation_meta': (AffiliationSchema().dump(affiliation_data) | {'id': -1}) if affiliation_data else None,
+            'affiliation_meta': (affiliation_schema.dump(affiliation_data) | {'id': -1}) if affiliation_data else None,
             'full_name': full_name,
             'first_name': first_name,
             'last_name': last_name,
@@ -1003,11 +1050,13 @@ class RHUserSearch(RHProtected):
             return self._serialize_pending_user(entry)
 
     def _process_pending_users(self, results):
-        cache = make_scoped_cache('external-user')
+        externals = {}
         for entry in results:
             ext_id = entry.pop('_ext_id', None)
             if ext_id is not None:
-                cache.set(ext_id, self.externals[ext_id], timeout=86400)
+                externals[ext_id] = self.externals[ext_id]
+        if externals:
+            make_scoped_cache('external-user').set_many(externals, timeout=86400)
 
     @use_kwargs({
         'first_name': fields.Str(validate=validate.Length(min=1)),
@@ -1025,22 +1074,23 @@ class RHUserSearch(RHProtected):
         matches = search_users(exact=exact, include_pending=True, external=external, **criteria)
         self.externals = {}
 
+        lower_criteria = [(k, v.lower()) for k, v in criteria.items()]
+        unaccent_criteria = [(k, remove_accents(v)) for k, v in lower_criteria]
+        favorites = session.user.favorite_user_ids if favorites_first else None
+
         def _sort_key(entry):
-            # Sort results by providing exact matches first, initially considering accents, and
-            # then without considering accents.
-            exact_match_keys = [entry[k].lower() != v.lower() for k, v in criteria.items()]
-            unaccent_exact_match_keys = [
-                remove_accents(entry[k].lower()) != remove_accents(v.lower())
-                for k, v in criteria.items()
-            ]
-            return *exact_match_keys, *unaccent_exact_match_keys, entry['full_name'], entry['email']
-
-        results = sorted((self._serialize_entry(entry) for entry in matches), key=_sort_key)
-        if favorites_first:
-            favorites = {u.id for u in session.user.favorite_users}
-            results.sort(key=lambda x: x['id'] not in favorites)
-        total = len(results)
-        results = results[:10]
+            # Sort results by providing favorites first (if requested), then exact matches, initially
+            # considering accents, and then without considering accents.
+            favorite_keys = [entry['id'] not in favorites] if favorites is not None else []
+            exact_match_keys = [entry[k].lower() != v for k, v in lower_criteria]
+            unaccent_exact_match_keys = [remove_accents(entry[k].lower()) != v for k, v in unaccent_criteria]
+            return (*favorite_keys, *exact_match_keys, *unaccent_exact_match_keys,
+                    entry['full_name'], entry['email'])
+
+        serialized = [self._serialize_entry(entry) for entry in matches]
+        total = len(serialized)
+        # we only return the first 10 results, so there's no need to sort all of them
+        results = nsmallest(10, serialized, key=_sort_key)
         self._process_pending_users(results)
         return jsonify(users=results, total=total)
 
@@ -16,9 +16,9 @@ from indico.core.config import config
 from indico.modules.auth.forms import LocalRegistrationForm, _check_existing_email
 from indico.modules.core.settings import social_settings
 from indico.modules.users import User
-from indico.modules.users.models.affiliations import Affiliation
 from indico.modules.users.models.emails import UserEmail
 from indico.modules.users.models.users import NameFormat
+from indico.modules.users.util import has_predefined_affiliations
 from indico.util.i18n import _, get_all_locales
 from indico.web.forms.base import IndicoForm
 from indico.web.forms.fields import (IndicoEnumSelectField, IndicoSelectMultipleCheckboxField, MultiStringField,
@@ -154,7 +154,7 @@ class AdminUserSettingsForm(IndicoForm):
         super().__init__(*args, **kwargs)
         if not multipass.has_moderated_providers:
             del self.mandatory_fields_account_request
-        if not Affiliation.query.filter(~Affiliation.is_deleted).has_rows():
+        if not has_predefined_affiliations():
             del self.only_predefined_affiliations
 
 
@@ -107,6 +107,18 @@ define_unaccented_lowercase_index(Affiliation.searchable_names, Affiliation.__ta
 make_fts_index(Affiliation, 'searchable_names')
 
 
+@listens_for(Affiliation, 'after_insert')
+@listens_for(Affiliation, 'after_delete')
+def _affiliation_added_or_removed(mapper, connection, target):
+    db.session.info['predefined_affiliations_changed'] = True
+
+
+@listens_for(Affiliation.is_deleted, 'set')
+def _affiliation_deleted_set(target, value, oldvalue, *unused):
+    if value != oldvalue:
+        db.session.info['predefined_affiliations_changed'] = True
+
+
 @listens_for(mapper, 'after_configured', once=True)
 def _mappers_configured():
     from indico.modules.events.models.persons import EventPerson
@@ -505,6 +505,17 @@ class User(PersonMixin, db.Model):
     def get_system_user():
         return User.query.filter_by(is_system=True).one()
 
+    @staticmethod
+    def build_identifier(user_id):
+        """Build the signed principal identifier of a user.
+
+        This is useful when only the id of a user is available and
+        loading the whole user just to get its `identifier` is not
+        needed.
+        """
+        signed_id = static_secure_serializer.dumps(user_id, 'principal-id')
+        return f'User:{user_id}:{signed_id}'
+
     @property
     def as_principal(self):
         """The serializable principal identifier of this user."""
@@ -512,8 +523,7 @@ class User(PersonMixin, db.Model):
 
     @property
     def identifier(self):
-        signed_id = static_secure_serializer.dumps(self.id, 'principal-id')
-        return f'User:{self.id}:{signed_id}'
+        return self.build_identifier(self.id)
 
     @property
     def persistent_identifier(self):
@@ -603,6 +613,14 @@ class User(PersonMixin, db.Model):
             return {}
         return {field: (identity.data.get(field) or '') for field in multipass.synced_fields}
 
+    @property
+    def favorite_user_ids(self):
+        """The ids of the user's favorite users.
+
+        Unlike `favorite_users` this does not load the users themselves.
+        """
+        return {id_ for id_, in User.query.with_parent(self, 'favorite_users').with_entities(User.id)}
+
     @property
     def has_picture(self):
         return self.picture_metadata is not None
@@ -170,3 +170,16 @@ def test_identifiers(app, dummy_user):
     id2, pid2 = dummy_user.identifier, dummy_user.persistent_identifier
     assert id1 != id2
     assert pid1 == pid2
+    assert User.build_identifier(dummy_user.id) == id2
+
+
+def test_favorite_user_ids(db, dummy_user, create_user):
+    user1 = create_user(123)
+    user2 = create_user(456)
+    assert dummy_user.favorite_user_ids == set()
+    dummy_user.favorite_users = {user1, user2}
+    db.session.flush()
+    assert dummy_user.favorite_user_ids == {123, 456}
+    user2.is_deleted = True
+    db.session.flush()
+    assert dummy_user.favorite_user_ids == {123}
@@ -9,6 +9,7 @@ import hashlib
 import os
 from collections import defaultdict
 from datetime import datetime
+from functools import lru_cache
 from io import BytesIO
 from operator import attrgetter, itemgetter
 
@@ -307,7 +308,8 @@ def search_users(exact=False, include_deleted=False, include_pending=False, incl
     query = (build_user_search_query(dict(criteria), exact=exact, include_deleted=include_deleted,
                                      include_pending=include_pending, include_blocked=include_blocked)
              .options(db.joinedload(User.identities),
-                      db.joinedload(User.merged_into_user)))
+                      db.joinedload(User.merged_into_user),
+                      db.joinedload(User.affiliation_link)))
 
     found_emails = {}
     found_identities = {}
@@ -554,6 +556,20 @@ def set_user_avatar(user, avatar, filename, lastmod=None):
     }
 
 
+@lru_cache(maxsize=1024)
+def render_default_avatar(bg_color, text):
+    """Render a default avatar as SVG.
+
+    Since there are only a few colors and the text is usually a
+    single letter, the rendered avatars are cached.
+
+    :param bg_color: The background color of the avatar
+    :param text: The text (usually a single letter) shown on the avatar
+    :return: The encoded SVG data
+    """
+    return render_template('users/avatar.svg', bg_color=bg_color, text=text).encode()
+
+
 def send_default_avatar(user: User | str | None):
     """Send a user's default avatar as an SVG.
 
@@ -568,8 +584,7 @@ def send_default_avatar(user: User | str | None):
     elif user.full_name:
         text = user.full_name[0].upper()
         color = get_color_for_user_id(user.id)
-    avatar = render_template('users/avatar.svg', bg_color=color, text=text)
-    return send_file('avatar.svg', BytesIO(avatar.encode()), mimetype='image/svg+xml',
+    return send_file('avatar.svg', BytesIO(render_default_avatar(color, text)), mimetype='image/svg+xml',
                      no_cache=False, inline=True, safe=False, max_age=86400*7)
 
 
@@ -585,6 +600,12 @@ def send_avatar(user):
 
 def get_avatar_url_from_name(first_name):
     first_char = first_name[0] if first_name else None
+    return _get_avatar_url_from_initial(first_char)
+
+
+@memoize_request
+def _get_avatar_url_from_initial(first_char):
+    # many users share the same initial, e.g. in search results
     return url_for('assets.avatar', name=first_char)
 
 
@@ -620,6 +641,16 @@ def _weighted_score(*params):
     return sum(db.cast(param, db.Integer) * weight for param, weight in params)
 
 
+@memoize_redis(3600)
+def has_predefined_affiliations():
+    """Check whether there are any (non-deleted) predefined affiliations.
+
+    The cached value is cleared after committing a transaction that
+    created, deleted or restored an affiliation.
+    """
+    return Affiliation.query.filter(~Affiliation.is_deleted).has_rows()
+
+
 @memoize_redis(3600, versioned=True)
 def search_affiliations(q):
     exact_match = _match_search(q, exact=True)
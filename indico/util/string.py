@@ -182,6 +182,9 @@ LATEX_MATH_PLACEHOLDER = '\uE000'
 
 
 def remove_accents(text):
+    if text.isascii():
+        # nothing to remove, and most names and emails are plain ascii
+        return text
     return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
 
 
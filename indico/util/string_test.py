@@ -14,8 +14,8 @@ import pytest
 from indico.util.string import (AutoLinkExtension, HTMLLinker, camelize, camelize_keys, crc32, extract_link_hrefs,
                                 format_email_with_name, format_repr, has_endpoint_links, has_relative_links,
                                 html_to_plaintext, make_unique_token, normalize_linebreaks, normalize_phone_number,
-                                render_markdown, sanitize_email, sanitize_for_platypus, sanitize_html, seems_html,
-                                slugify, snakify, snakify_keys, strip_tags, text_to_repr)
+                                remove_accents, render_markdown, sanitize_email, sanitize_for_platypus, sanitize_html,
+                                seems_html, slugify, snakify, snakify_keys, strip_tags, text_to_repr)
 
 
 def test_seems_html():
@@ -185,6 +185,17 @@ def test_normalize_phone_number(input, output):
     assert normalize_phone_number(input) == output
 
 
+@pytest.mark.parametrize(('input', 'output'), (
+    ('', ''),
+    ('foo', 'foo'),
+    ('José', 'Jose'),
+    ('Ångström', 'Angstrom'),
+    ('Łukasz', 'Łukasz'),
+))
+def test_remove_accents(input, output):
+    assert remove_accents(input) == output
+
+
 @pytest.mark.parametrize(('input', 'output'), (
     ('', ''),
     ('foo', 'foo'),